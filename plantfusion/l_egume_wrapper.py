@@ -23,7 +23,7 @@ from legume.initialisation import init_plant_residues_fromParamP
 import riri5.RIRI5 as riri
 
 from plantfusion.utils import create_child_folder
-from plantfusion.light_wrapper import Light_wrapper
+from plantfusion.light_wrapper import Light_wrapper, OrganResults
 from plantfusion.indexer import Indexer
 
 
@@ -222,7 +222,8 @@ class L_egume_wrapper(object):
         -------
         plantgl.Scene or dict,
             if elements == "triangles", it returns a plantgl.Scene of leaves 
-            if elements == "voxels", it returns a dict with a leaf area entry and distribution of leaf angles entry
+            if elements == "voxels", it returns a dict with a leaf area entry and distribution of leaf angles entry, 
+            the l-egume arrays themselves without copy
         """        
         if elements == "triangles":
             return self.lsystem.sceneInterpretation(self.lstring)
@@ -266,7 +267,7 @@ class L_egume_wrapper(object):
                 energy=energy,
                 nb0=lighting.nb_empty_z_layers(),
                 elements_outputs=lighting.results_organs(),
-                sensors_outputs=lighting.results_sensors(),
+                sensors_outputs=lighting.sensors_arrays(),
             )
 
         elif lighting.lightmodel == "ratp":
@@ -278,7 +279,7 @@ class L_egume_wrapper(object):
             self.res_trans = lighting.res_trans()
             self.res_abs_i = lighting.res_abs_i()
 
-        self.compute_plants_interception(lighting.results_organs(), energy, lighting.soil_energy())
+        self.compute_plants_interception(lighting.organs_view(), energy, lighting.soil_energy())
         self.compute_potential_plant_growth()
 
         if selective_global_index is not None:
@@ -391,7 +392,7 @@ class L_egume_wrapper(object):
 
         Parameters
         ----------
-        organs_results : pandas.Dataframe, optional
+        organs_results : OrganResults or pandas.Dataframe, optional
             lighting results per organs from the light wrapper, by default None
         energy : float, optional
             meteo ray input in W/m², by default 1
@@ -427,14 +428,13 @@ class L_egume_wrapper(object):
         pari_canopy = numpy.sum(self.invar["parip"])
         
         # we add radiations from other fspm in the simulation
-        if organs_results is not None and not organs_results.empty:
-            if isinstance(self.global_index, list):
-                species_not_legume = [i for i in organs_results["VegetationType"].unique() if i not in self.global_index]
-            else:
-                species_not_legume = [i for i in organs_results["VegetationType"].unique() if i != self.global_index]
-            filtered_data = organs_results[(organs_results.VegetationType.isin(species_not_legume))]
-            if not filtered_data.empty:
-                pari_canopy += numpy.sum(filtered_data["par Ei"]) * energy
+        if isinstance(organs_results, pandas.DataFrame):
+            organs_results = None if organs_results.empty else OrganResults(organs_results)
+        if organs_results is not None:
+            legume_species = self.global_index if isinstance(self.global_index, list) else [self.global_index]
+            for i in organs_results.species:
+                if i not in legume_species:
+                    pari_canopy += numpy.sum(organs_results.specy(i)["par Ei"]) * energy
 
         ratio_pari_plante = self.invar["parip"] / (pari_canopy + 10e-15)
         self.epsi = pari_soil * ratio_pari_plante
@@ -782,8 +782,9 @@ class L_egume_wrapper(object):
             number of empty layers from top of the canopy and maximum z layers in m_lais
         elements_outputs : pandas.Dataframe
             lighting results at triangle scale
-        sensors_outputs : pandas.Dataframe
-            intercepted light by virtual sensors following l-egume internal grid of voxels
+        sensors_outputs : dict or pandas.Dataframe
+            intercepted light by virtual sensors following l-egume internal grid of voxels, arrays [iz, iy, ix] per 
+            sensors grid from ``Light_wrapper.sensors_arrays`` or lighting results of sensors
         epsilon : float, optional
             criteria of minimum intercepted portion of PAR in a non empty voxel, by default 1e-8
 
@@ -849,14 +850,16 @@ class L_egume_wrapper(object):
                 sensors_specy_id = self.global_index
             else:
                 sensors_specy_id = 0
-            sensors = sensors_outputs[sensors_outputs.VegetationType==sensors_specy_id]
-            ID_capt = 0
-            for ix in range(m_lais.shape[3]):
-                for iy in range(m_lais.shape[2]):
-                    for iz in range(m_lais.shape[1] - nb0):
-                        a = min(sensors.iloc[ID_capt]["PAR"], 1.0)
-                        res_trans[((m_lais.shape[1] - 1)) - iz][iy][ix] = a
-                        ID_capt += 1
+            if isinstance(sensors_outputs, pandas.DataFrame):
+                sensors = Light_wrapper.sensors_grid(
+                    sensors_outputs, sensors_specy_id, (m_lais.shape[3], m_lais.shape[2])
+                )
+            else:
+                sensors = sensors_outputs[sensors_specy_id]
+
+            # z layers of l-egume grid start from the top, sensors stop at the top of the canopy
+            nz_sensors = min(sensors.shape[0], m_lais.shape[1] - nb0)
+            res_trans[m_lais.shape[1] - nz_sensors :] = numpy.minimum(sensors[:nz_sensors][::-1], 1.0)
 
         # surface d'une face d'un voxel
         dS = self.lsystem.tag_loop_inputs[15]
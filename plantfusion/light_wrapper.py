@@ -5,13 +5,119 @@
 """
 
 import os
+import copy
+import hashlib
+import sys
+import collections
+import json
+import time
+import numpy
+import pandas
 
+import openalea.plantgl.all as plantgl
 from lightvegemanager.LVM import LightVegeManager
-from plantfusion.utils import create_child_folder
-from plantfusion.planter import Planter
+from plantfusion.utils import create_child_folder, BackgroundWriter
+from plantfusion.lighting_store import LightingStore, write_vtk_organs
+from plantfusion.planter import Planter, decimate_triangles, shape_triangles
 from plantfusion.indexer import Indexer
 
 
+# LightVegeManager outputs read by Light_wrapper accessors
+LIGHT_OUTPUTS = {
+    "organs": lambda light: light.elements_outputs,
+    "voxels": lambda light: light.voxels_outputs,
+    "triangles": lambda light: light.triangles_outputs,
+    "sensors": lambda light: light.sensors_outputs(dataframe=True),
+    "transmitted": lambda light: light.riri5_transmitted_light,
+    "intercepted": lambda light: light.riri5_intercepted_light,
+    "soil": lambda light: light.soilenergy,
+    "empty layers": lambda light: light.legume_empty_layers,
+    "domain": lambda light: light.domain,
+}
+
+
+class OrganResults:
+    """Lighting results at organ scale as numpy columns grouped by specy
+
+    Note
+    ----
+    Rows are sorted by specy, the results of one specy are views on the columns
+
+    Parameters
+    ----------
+    organs_results : pandas.Dataframe
+        lighting results at organ scale, with "VegetationType" and "Organ" columns
+
+    """    
+    def __init__(self, organs_results) -> None:
+        """Constructor, converts the results columns to numpy arrays
+
+        """        
+        order = numpy.argsort(organs_results["VegetationType"].to_numpy(), kind="stable")
+        self.columns: dict = {c: organs_results[c].to_numpy()[order] for c in organs_results.columns}
+
+        species, starts, counts = numpy.unique(self.columns["VegetationType"], return_index=True, return_counts=True)
+        self.species: list = species.tolist()
+        self.slices: dict = {s: slice(start, start + count) for s, start, count in zip(self.species, starts, counts)}
+        self.organs_rows: dict = {}
+
+    def specy(self, global_index):
+        """Results of one specy
+
+        Parameters
+        ----------
+        global_index : int
+            specy ID in simulation
+
+        Returns
+        -------
+        dict
+            each entry is {column name : numpy.array of the specy organs}
+        """        
+        rows = self.slices.get(global_index, slice(0, 0))
+        return {c: values[rows] for c, values in self.columns.items()}
+
+    def rows(self, global_index):
+        """Index of the organs of one specy, computed once
+
+        Parameters
+        ----------
+        global_index : int
+            specy ID in simulation
+
+        Returns
+        -------
+        dict
+            each entry is {organ id : row of its first result in the specy columns}
+        """        
+        if global_index not in self.organs_rows:
+            organs = self.specy(global_index)["Organ"].tolist()
+            rows = {}
+            for row, organ in enumerate(organs):
+                rows.setdefault(organ, row)
+            self.organs_rows[global_index] = rows
+        return self.organs_rows[global_index]
+
+    def value(self, global_index, organ, column):
+        """Result of one organ
+
+        Parameters
+        ----------
+        global_index : int
+            specy ID in simulation
+        organ : int
+            organ id
+        column : str
+            results column
+
+        Returns
+        -------
+        float
+            organ result
+        """        
+        return self.specy(global_index)[column][self.rows(global_index)[organ]]
+
+
 class Light_wrapper(object):
     """Wrapper for LightVegeManager
     
@@ -36,7 +142,7 @@ class Light_wrapper(object):
     coordinates : list, optional
         [latitude, longitude, timezone], by default [46.4, 0.0, 1.0]
     infinite : bool, optional
-        activate infinite scene replication, by default True
+        activate infinite scene replication, by default True, always activated if the planter generates a periodic tile
     legume_wrapper : L_egume_wrapper or list of L_egume_wrapper, optional
         instance(s) of L_egume_wrapper in the simulation, by default None
     caribu_opt : dict, optional
@@ -53,6 +159,38 @@ class Light_wrapper(object):
         activate write the scene in VTK and bgeom files, by default False
     out_folder : str, optional
         outputs folder path where to write geometric files if writegeo == True, by default ""
+    decimation_target : int, optional
+        maximum number of triangles per organ of each plant, organ meshes are decimated before each lighting, by default None for no decimation
+    cache_size : int, optional
+        maximum number of lighting results kept in a LRU cache, a run with the same scenes, sky, sun and energy returns
+        the stored results, by default 0 for no cache
+    cache_memory : int, optional
+        maximum memory size in bytes of the cached results, by default None for no limit
+    writegeo_format : str, optional
+        format of geometric files, choose between "vtk" for VTK and bgeom files at each lighting step or "store" for one 
+        folder of numpy files with triangles written once per geometry and organ results of each step, see ``LightingStore``, 
+        by default "vtk"
+    async_writegeo : bool, optional
+        write geometric files in a background thread, the simulation continues while files are written. Only triangles 
+        and their organ results are then written in VTK files, without voxels, sensors and bgeom files, by default False
+    writegeo_queue_size : int, optional
+        maximum number of lighting steps waiting to be written with async_writegeo, by default 4
+    sun_course_hours : list of int, optional
+        hours of the day where the geometry is lit once per day, organ results at other hours are interpolated between them, 
+        see ``interpolated_organs``, by default None
+    change_tolerance : float, optional
+        maximum relative change of leaf area and height per specy since the last computed lighting to skip a lighting, 
+        the last results are then reused, see ``canopy_descriptors``, by default None for a lighting at each run
+    refresh_interval : int, optional
+        maximum number of consecutive skipped lightings with change_tolerance, by default 5
+    hybrid_interval : int, optional
+        only with CARIBU, run CARIBU every hybrid_interval lightings and RATP with a correction learned from the last 
+        CARIBU lighting in between, see ``hybrid_organs``, by default None for CARIBU at each lighting
+    hybrid_voxels_size : list, optional
+        voxels size in m of RATP in the hybrid mode [dx, dy, dz], dz is also the thickness of the correction layers, 
+        by default [0.1, 0.1, 0.1]
+    metrics_log : bool, optional
+        append the metrics of each run in ``out_folder/light/metrics.jsonl``, see ``metrics``, by default False
 
     """    
     def __init__(
@@ -74,6 +212,18 @@ class Light_wrapper(object):
         mu=1.0,
         writegeo=False,
         out_folder="",
+        decimation_target=None,
+        cache_size=0,
+        cache_memory=None,
+        sun_course_hours=None,
+        async_writegeo=False,
+        writegeo_queue_size=4,
+        writegeo_format="vtk",
+        change_tolerance=None,
+        refresh_interval=5,
+        hybrid_interval=None,
+        hybrid_voxels_size=[0.1, 0.1, 0.1],
+        metrics_log=False,
     ):
         """Constructor, create an instance of LightVegeManager
 
@@ -82,17 +232,63 @@ class Light_wrapper(object):
         self.indexer = indexer
         self.writegeo = writegeo
         self.compute_sensors = False
+        self.sensors_layouts: dict = {}
+        self.sensors_arrays_cache = None
         self.direct=direct
-        if writegeo:
+        self.decimation_target = decimation_target
+        self.decimation_report: dict = {}
+        self.decimation_cache = None
+        self.cache_size = cache_size
+        self.cache_memory = cache_memory
+        self.results_cache = collections.OrderedDict()
+        self.current_results = None
+        self.organs_view_cache = None
+        self.geometry = None
+        self.geometry_fingerprint = None
+        self.built_geometry_fingerprint = None
+        self.__geometry_hash = None
+        self.triangles_cache = None
+        self.sun_course_hours = sun_course_hours
+        self.sun_course_key = None
+        self.sun_course_results = None
+        self.change_tolerance = change_tolerance
+        self.refresh_interval = refresh_interval
+        self.lit_descriptors = None
+        self.lit_inputs = None
+        self.skipped_steps = 0
+        self.hybrid_interval = hybrid_interval
+        self.hybrid_steps = 0
+        self.hybrid_results = None
+        self.hybrid_factors = None
+        self.hybrid_built_geometry_fingerprint = None
+        self.hybrid_layer_thickness = hybrid_voxels_size[2]
+        self.metrics: dict = {}
+        self.metrics_totals: dict = {}
+        self.metrics_log = metrics_log
+        if writegeo or metrics_log:
             create_child_folder(os.path.normpath(out_folder), "light")
             self.out_folder = os.path.join(os.path.normpath(out_folder), "light")
-            create_child_folder(self.out_folder, "vtk")
-            create_child_folder(self.out_folder, "plantgl")
+        if writegeo:
+            if writegeo_format == "store":
+                self.store = LightingStore(os.path.join(self.out_folder, "store"))
+            else:
+                create_child_folder(self.out_folder, "vtk")
+                create_child_folder(self.out_folder, "plantgl")
+        self.writegeo_format = writegeo_format
+        if writegeo and async_writegeo:
+            self.writer = BackgroundWriter(writegeo_queue_size)
+        else:
+            self.writer = None
 
         self.lightmodel = lightmodel
 
         self.type_domain = planter.type_domain
         self.domain = planter.domain
+        self.tile_replications = planter.tile_replications
+
+        # a periodic tile stands for the whole field only if it is replicated
+        if planter.periodic:
+            infinite = True
 
         self.environment = {
             "coordinates": coordinates,
@@ -151,6 +347,7 @@ class Light_wrapper(object):
                         ]
                         dxyz_legume = [x * 0.01 for x in wrap.voxels_size()]  # conversion de cm à m
                         lightmodel_parameters["sensors"][wrap.global_index] = ["grid", dxyz_legume, nxyz_legume, orig]
+                        self.sensors_layouts[wrap.global_index] = (nxyz_legume, dxyz_legume, orig)
                 else:                
                     if "translate" in planter.transformations:
                         if isinstance(legume_wrapper.global_index, list):
@@ -161,6 +358,7 @@ class Light_wrapper(object):
                                 x_trans, y_trans, z = planter.transformations["translate"][legume_wrapper.global_index]
                     orig = [self.domain[0][0]+x_trans, self.domain[0][1]+y_trans, 0.0]   
                     lightmodel_parameters["sensors"] = ["grid", dxyz_legume, nxyz_legume, orig]
+                    self.sensors_layouts[0] = (nxyz_legume, dxyz_legume, orig)
 
             lightmodel_parameters["debug"] = False
             lightmodel_parameters["soil mesh"] = 1
@@ -177,14 +375,7 @@ class Light_wrapper(object):
 
             lightmodel_parameters["mu"] = [mu] * self.number_of_species
             lightmodel_parameters["reflectance coefficients"] = [[0.0, 0.0]] * self.number_of_species
-
-            if "/" in angle_distrib_algo or "\\" in angle_distrib_algo:
-                lightmodel_parameters["angle distrib algo"] = "file"
-                lightmodel_parameters["angle distrib file"] = angle_distrib_algo
-            else:
-                lightmodel_parameters["angle distrib algo"] = angle_distrib_algo
-                lightmodel_parameters["nb angle classes"] = nb_angle_class
-                lightmodel_parameters["soil reflectance"] = [0.0, 0.0]
+            lightmodel_parameters.update(self.angle_distrib_parameters(angle_distrib_algo, nb_angle_class))
 
         else:
             print("lightmodel not recognize")
@@ -198,17 +389,125 @@ class Light_wrapper(object):
             main_unit="m",
         )
 
+        # cheap voxel model of the hybrid mode
+        if hybrid_interval is not None:
+            if lightmodel != "caribu":
+                raise ValueError("hybrid_interval is only available with CARIBU")
+            self.hybrid_light = LightVegeManager(
+                environment=self.environment,
+                lightmodel="ratp",
+                lightmodel_parameters={
+                    "voxel size": hybrid_voxels_size,
+                    "full grid": False,
+                    "mu": [mu] * self.number_of_species,
+                    "reflectance coefficients": [[0.0, 0.0]] * self.number_of_species,
+                    **self.angle_distrib_parameters(angle_distrib_algo, nb_angle_class),
+                },
+                main_unit="m",
+            )
+
         self.i_vtk = 0
 
-    def run(self, energy=1.0, scenes=[], day=1, hour=12, parunit="RG", stems=None):
+    @staticmethod
+    def angle_distrib_parameters(angle_distrib_algo, nb_angle_class):
+        """RATP parameters of the leaf angle distribution
+
+        Parameters
+        ----------
+        angle_distrib_algo : str
+            computation type for leaf angle distribution, or path of a leaf angle distribution file
+        nb_angle_class : int
+            number of leaf angle classes between 0 and 90°
+
+        Returns
+        -------
+        dict
+            LightVegeManager parameters
+        """        
+        if "/" in angle_distrib_algo or "\\" in angle_distrib_algo:
+            return {"angle distrib algo": "file", "angle distrib file": angle_distrib_algo}
+        else:
+            return {
+                "angle distrib algo": angle_distrib_algo,
+                "nb angle classes": nb_angle_class,
+                "soil reflectance": [0.0, 0.0],
+            }
+
+    def build(self, scenes=[], stems=None):
+        """Sets the geometry lit by the next runs
+
+        Note
+        ----
+        LightVegeManager builds the geometry at the next run only if its fingerprint changed since the last built 
+        geometry, see ``scenes_fingerprint``. The content hash ``geometry_hash`` is only computed when it is read, 
+        once per fingerprint
+
+        Parameters
+        ----------
+        scenes : list, optional
+            lits of geometric scenes available with LightVegeManager or flat triangles arrays from Planter, by default []
+        stems : list of tuple, optional
+            precise if stems are among the input scenes. An element of the list is (specy ID, organ ID), by default None
+        """        
+        if self.decimation_target is not None:
+            scenes = self.decimate_scenes(scenes)
+        scenes = [self.flat_triangles_scene(s) if self.is_flat_triangles(s) else s for s in scenes]
+
+        self.geometry = {"scenes": scenes, "domain": self.domain, "transformations": self.transformations, "stems id": stems}
+        fingerprint = self.scenes_fingerprint(scenes, stems)
+        if fingerprint != self.geometry_fingerprint:
+            self.geometry_fingerprint = fingerprint
+            self.__geometry_hash = None
+
+    @property
+    def geometry_hash(self):
+        """Content hash of the current geometry, computed once per geometry when the results cache, the store or the
+        hybrid mode needs it, see ``geometry_key``
+
+        Returns
+        -------
+        str or None
+            hexadecimal digest of the current geometry, None without geometry
+        """        
+        if self.__geometry_hash is None and self.geometry is not None:
+            self.__geometry_hash = self.geometry_key(self.geometry["scenes"], self.geometry["stems id"])
+        return self.__geometry_hash
+
+    def dirty_geometry(self):
+        """Check if the geometry must be built again by LightVegeManager
+
+        Returns
+        -------
+        bool
+            True if the current geometry is different from the last built geometry
+        """        
+        return self.geometry_fingerprint is None or self.geometry_fingerprint != self.built_geometry_fingerprint
+
+    def run(self, energy=1.0, scenes=None, day=1, hour=12, parunit="RG", stems=None):
         """Run the lighting computation
 
+        Note
+        ----
+        If scenes are given, they are set as the current geometry with ``build``, else the last geometry is lit again
+        without building it.
+
+        If the inputs are found in the results cache, LightVegeManager is not called and no geometric file is written
+
+        With ``change_tolerance``, the lighting of new scenes is skipped if the canopy did not change enough since the 
+        last computed lighting with the same energy and parunit, and the accessors return the last results. The sun 
+        position is then the one of the last computed lighting.
+
+        With ``hybrid_interval``, RATP lights the geometry at each run. Between two CARIBU lightings, the accessors 
+        return RATP organ results corrected by ``hybrid_organs`` and the other results of the last CARIBU lighting.
+
+        Timings and counts of the run are recorded in ``metrics``.
+
         Parameters
         ----------
         energy : float, optional
             radiation input from meteo in W/m², by default 1.0
         scenes : list, optional
-            lits of geometric scenes available with LightVegeManager, by default []
+            lits of geometric scenes available with LightVegeManager or flat triangles arrays from Planter, by default None for the geometry of the last ``build``
         day : int, optional
             day of the year, by default 1
         hour : int, optional
@@ -218,9 +517,95 @@ class Light_wrapper(object):
         stems : list of tuple, optional
             precise if stems are among the input scenes. An element of the list is (specy ID, organ ID), by default None
         """        
-        geometry = {"scenes": scenes, "domain": self.domain, "transformations": self.transformations, "stems id": stems}
+        self.write_metrics()
+        self.metrics = {
+            "step": self.metrics_totals.get("runs", 0),
+            "day": day,
+            "hour": hour,
+            "build time": 0.0,
+            "lighting time": 0.0,
+            "extraction time": 0.0,
+            "export time": 0.0,
+        }
+        self.metrics["lighting"] = self.__run(energy, scenes, day, hour, parunit, stems)
+        self.metrics.update(self.geometry_counts())
+
+        self.metrics_totals["runs"] = self.metrics_totals.get("runs", 0) + 1
+        name = self.metrics["lighting"] + " runs"
+        self.metrics_totals[name] = self.metrics_totals.get(name, 0) + 1
+
+    def __run(self, energy, scenes, day, hour, parunit, stems):
+        """Lighting steps of ``run``
+
+        Returns
+        -------
+        str
+            "skipped", "cached", "hybrid" or "computed"
+        """        
+        start = time.perf_counter()
+        if scenes is not None:
+            self.build(scenes, stems)
+        if self.geometry is None:
+            raise ValueError("no geometry to light, call build before run")
+
+        if self.change_tolerance is not None:
+            if scenes is None:
+                # the last results may not be of the last described canopy
+                self.lit_descriptors = None
+            else:
+                descriptors = self.canopy_descriptors()
+                if (
+                    self.lit_inputs == (energy, parunit)
+                    and self.skipped_steps < self.refresh_interval
+                    and not self.canopy_changed(descriptors)
+                ):
+                    self.skipped_steps += 1
+                    self.add_time("build time", start)
+                    return "skipped"
+                self.lit_descriptors = descriptors
+                self.lit_inputs = (energy, parunit)
+                self.skipped_steps = 0
+        self.add_time("build time", start)
+
+        self.sensors_arrays_cache = None
+
+        # same inputs as a cached run, the stored results are returned by the accessors
+        if self.cache_size > 0:
+            key = self.results_key(energy, day, hour, parunit)
+            if key in self.results_cache:
+                self.results_cache.move_to_end(key)
+                self.current_results = self.results_cache[key][0]
+                if not self.direct:
+                    self.current_results = self.dated_results(self.current_results, day, hour)
+                return "cached"
+        self.current_results = None
+
+        if self.hybrid_interval is not None:
+            caribu_step = self.hybrid_factors is None or self.hybrid_steps % self.hybrid_interval == 0
+            self.hybrid_steps += 1
+            start = time.perf_counter()
+            if self.hybrid_built_geometry_fingerprint != self.geometry_fingerprint:
+                self.hybrid_light.build(self.geometry)
+                self.hybrid_built_geometry_fingerprint = self.geometry_fingerprint
+            self.add_time("build time", start)
+            start = time.perf_counter()
+            self.hybrid_light.run(energy=energy, day=day, hour=hour, truesolartime=True, parunit=parunit)
+            self.add_time("lighting time", start)
 
-        self.light.build(geometry)
+            if not caribu_step:
+                start = time.perf_counter()
+                self.current_results = dict(self.hybrid_results)
+                self.current_results["organs"] = self.hybrid_organs(self.hybrid_light.elements_outputs)
+                self.add_time("extraction time", start)
+                return "hybrid"
+
+        start = time.perf_counter()
+        if self.dirty_geometry():
+            self.light.build(self.geometry)
+            self.built_geometry_fingerprint = self.geometry_fingerprint
+        self.add_time("build time", start)
+
+        start = time.perf_counter()
         self.light.run(
             energy=energy,
             day=day,
@@ -228,40 +613,861 @@ class Light_wrapper(object):
             truesolartime=True,
             parunit=parunit,
         )
+        self.add_time("lighting time", start)
 
-        if self.writegeo:
-            file_project_name = os.path.join(os.path.normpath(self.out_folder), "vtk", "plantfusion_")
-            
-            if self.lightmodel == "ratp":
-                printvoxels = True
-            elif self.lightmodel == "caribu":
-                printvoxels = True
-
-            self.light.to_VTK(lighting=True, 
-                                path=file_project_name, 
-                                i=self.i_vtk, 
-                                printtriangles=True, 
-                                printvoxels=printvoxels, 
-                                virtual_sensors=self.compute_sensors, 
-                                sun=self.direct)
-            scene_plantgl= self.light.to_plantGL(lighting=True, 
-                                                    printtriangles=True, 
-                                                    printvoxels=printvoxels, 
-                                                    virtual_sensors=self.compute_sensors)
-            
-            if self.compute_sensors:
-                scene_plantgl[0].save(
-                    os.path.join(self.out_folder, "plantgl", "scene_light_plantgl_" + str(self.i_vtk)) + ".bgeom"
-                )
-                scene_plantgl[1].save(
-                    os.path.join(self.out_folder, "plantgl", "sensors_plantgl_" + str(self.i_vtk)) + ".bgeom"
-                )
+        start = time.perf_counter()
+        if self.hybrid_interval is not None:
+            self.hybrid_results = self.__snapshot_results()
+            self.hybrid_factors = self.hybrid_correction(self.light.elements_outputs, self.hybrid_light.elements_outputs)
+
+        if self.cache_size > 0:
+            self.__store_results(key)
+        self.add_time("extraction time", start)
+
+        start = time.perf_counter()
+        if self.writegeo and self.writegeo_format == "store":
+            # the geometry is tesselated only if it is not in the store
+            if self.geometry_hash in self.store.geometries:
+                geometry_number = self.store.geometries[self.geometry_hash]
             else:
-                scene_plantgl.save(
-                    os.path.join(self.out_folder, "plantgl", "scene_light_plantgl_" + str(self.i_vtk)) + ".bgeom"
+                geometry_number = self.store.add_geometry(self.geometry_hash, *self.geometry_triangles())
+            self.store.append(day, hour, geometry_number, self.results_organs().copy())
+
+        elif self.writegeo:
+            if self.writer is not None:
+                # plain arrays copied in the main thread, LightVegeManager replaces its outputs at the next build and run
+                results = self.results_organs()
+                columns = [c for c in results.select_dtypes(include="number").columns if c not in ("VegetationType", "Organ")]
+                self.writer.submit(
+                    write_vtk_organs,
+                    os.path.join(os.path.normpath(self.out_folder), "vtk", "plantfusion_{}.vtk".format(self.i_vtk)),
+                    *self.geometry_triangles(),
+                    results["VegetationType"].to_numpy(),
+                    results["Organ"].to_numpy(),
+                    {c: results[c].to_numpy(dtype=float) for c in columns},
                 )
+            else:
+                self.write_geometry(self.light, self.i_vtk)
 
             self.i_vtk += 1
+        self.add_time("export time", start)
+
+        return "computed"
+
+    def add_time(self, phase, start):
+        """Adds the time elapsed since start to a phase of the current run metrics and to the totals
+
+        Parameters
+        ----------
+        phase : str
+            "build time", "lighting time", "extraction time" or "export time"
+        start : float
+            start of the phase from ``time.perf_counter``
+        """        
+        elapsed = time.perf_counter() - start
+        self.metrics[phase] = self.metrics.get(phase, 0.0) + elapsed
+        self.metrics_totals[phase] = self.metrics_totals.get(phase, 0.0) + elapsed
+
+    def geometry_counts(self):
+        """Number of triangles, voxels and virtual sensors of the current lighting results
+
+        Returns
+        -------
+        dict
+            "triangles", "voxels" and "sensors" entries, 0 if the light model has no such results
+        """        
+        counts = {}
+        for name in ("triangles", "voxels"):
+            try:
+                output = self.__output(name)
+                counts[name] = len(output) if output is not None else 0
+            except Exception:
+                counts[name] = 0
+        counts["sensors"] = int(sum(numpy.prod(nxyz) for nxyz, dxyz, origin in self.sensors_layouts.values()))
+        return counts
+
+    def write_metrics(self):
+        """Appends the metrics of the last run in ``out_folder/light/metrics.jsonl`` if metrics_log is activated
+
+        Note
+        ----
+        Accessors time after a run is counted in its extraction time, the metrics of a run are then written at the 
+        next run or at ``flush``
+        """        
+        if self.metrics_log and "step" in self.metrics:
+            with open(os.path.join(self.out_folder, "metrics.jsonl"), "a") as file:
+                # numpy scalars from meteo inputs
+                file.write(json.dumps(self.metrics, default=lambda v: v.item()) + "\n")
+            self.metrics = {}
+
+    def write_geometry(self, light, i_vtk):
+        """Writes the lit geometry in VTK and bgeom files
+
+        Parameters
+        ----------
+        light : LightVegeManager
+            LightVegeManager instance after a lighting
+        i_vtk : int
+            lighting step number in the files names
+        """        
+        file_project_name = os.path.join(os.path.normpath(self.out_folder), "vtk", "plantfusion_")
+        
+        if self.lightmodel == "ratp":
+            printvoxels = True
+        elif self.lightmodel == "caribu":
+            printvoxels = True
+
+        light.to_VTK(lighting=True, 
+                        path=file_project_name, 
+                        i=i_vtk, 
+                        printtriangles=True, 
+                        printvoxels=printvoxels, 
+                        virtual_sensors=self.compute_sensors, 
+                        sun=self.direct)
+        scene_plantgl= light.to_plantGL(lighting=True, 
+                                            printtriangles=True, 
+                                            printvoxels=printvoxels, 
+                                            virtual_sensors=self.compute_sensors)
+        
+        if self.compute_sensors:
+            scene_plantgl[0].save(
+                os.path.join(self.out_folder, "plantgl", "scene_light_plantgl_" + str(i_vtk)) + ".bgeom"
+            )
+            scene_plantgl[1].save(
+                os.path.join(self.out_folder, "plantgl", "sensors_plantgl_" + str(i_vtk)) + ".bgeom"
+            )
+        else:
+            scene_plantgl.save(
+                os.path.join(self.out_folder, "plantgl", "scene_light_plantgl_" + str(i_vtk)) + ".bgeom"
+            )
+
+    def geometry_triangles(self):
+        """Triangles of the current geometry with the scenes transformations
+
+        Note
+        ----
+        Voxels scenes have no triangles. The triangles are computed once per geometry, the returned arrays must not
+        be modified.
+
+        Returns
+        -------
+        numpy.array, numpy.array, numpy.array
+            vertices of each triangle in m (number of triangles, 3, 3), specy ID and organ ID of each triangle
+        """        
+        if self.triangles_cache is None or self.triangles_cache[0] != self.geometry_fingerprint:
+            self.triangles_cache = (self.geometry_fingerprint, self.__geometry_triangles())
+        return self.triangles_cache[1]
+
+    def __geometry_triangles(self):
+        """Tesselation of the current geometry, see ``geometry_triangles``
+        """        
+        triangles, species, organs = [], [], []
+        for specy_id, scene in enumerate(self.geometry["scenes"]):
+            if isinstance(scene, plantgl.Scene):
+                organs_triangles = [(shp.id, shape_triangles(shp)) for shp in scene]
+            elif isinstance(scene, dict) and "LA" not in scene:
+                organs_triangles = [(organ_id, numpy.asarray(t, dtype=float).reshape(-1, 3, 3)) for organ_id, t in scene.items()]
+            else:
+                continue
+
+            for organ_id, organ_triangles in organs_triangles:
+                if self.transformations.get("scenes unit", {}).get(specy_id) == "cm":
+                    organ_triangles = organ_triangles * 0.01
+                if specy_id in self.transformations.get("translate", {}):
+                    organ_triangles = organ_triangles + numpy.array(self.transformations["translate"][specy_id])
+                triangles.append(organ_triangles)
+                species.append(numpy.full(len(organ_triangles), specy_id))
+                organs.append(numpy.full(len(organ_triangles), organ_id))
+
+        if not triangles:
+            return numpy.zeros((0, 3, 3)), numpy.zeros(0, dtype=int), numpy.zeros(0, dtype=int)
+        return numpy.concatenate(triangles), numpy.concatenate(species), numpy.concatenate(organs)
+
+    def canopy_descriptors(self):
+        """Cheap descriptors of the current geometry per specy
+
+        Note
+        ----
+        Triangles scenes are described by their area, maximum height and number of organs, voxels scenes by their 
+        leaf area, number of non empty layers and number of non empty voxels. Other scenes are not described.
+        plantgl scenes are not tesselated, their area and bounding box are computed by plantgl.
+
+        Returns
+        -------
+        dict
+            each entry is {specy ID : (leaf area, height, number of elements)}
+        """        
+        descriptors = {}
+        for specy_id, scene in enumerate(self.geometry["scenes"]):
+            if isinstance(scene, plantgl.Scene) and len(scene) > 0:
+                area = sum(plantgl.surface(shp.geometry) for shp in scene)
+                height = plantgl.BoundingBox(scene).upperRightCorner[2]
+                number_of_elements = len({shp.id for shp in scene})
+
+            elif isinstance(scene, dict) and "LA" in scene:
+                leaf_area = numpy.asarray(scene["LA"], dtype=float)
+                # l-egume grid is [specy, z, y, x]
+                layers = leaf_area.reshape(-1, *leaf_area.shape[-3:]).sum(axis=(0, 2, 3))
+                descriptors[specy_id] = (
+                    float(leaf_area.sum()),
+                    float(numpy.count_nonzero(layers)),
+                    int(numpy.count_nonzero(leaf_area)),
+                )
+                continue
+
+            elif isinstance(scene, dict) and len(scene) > 0:
+                triangles = numpy.concatenate(
+                    [numpy.asarray(t, dtype=float).reshape(-1, 3, 3) for t in scene.values()]
+                )
+                area = self.triangles_area_inclination(triangles)[0].sum()
+                height = triangles[:, :, 2].max()
+                number_of_elements = len(scene)
+
+            else:
+                continue
+
+            if self.transformations.get("scenes unit", {}).get(specy_id) == "cm":
+                area, height = area * 1e-4, height * 0.01
+            if specy_id in self.transformations.get("translate", {}):
+                height += self.transformations["translate"][specy_id][2]
+            descriptors[specy_id] = (float(area), float(height), number_of_elements)
+        return descriptors
+
+    def canopy_changed(self, descriptors):
+        """Check if the canopy changed more than ``change_tolerance`` since the last computed lighting
+
+        Parameters
+        ----------
+        descriptors : dict
+            descriptors of the current geometry, see ``canopy_descriptors``
+
+        Returns
+        -------
+        bool
+            True if a specy appeared, its number of elements changed or its leaf area or height changed more than the tolerance
+        """        
+        if self.lit_descriptors is None or descriptors.keys() != self.lit_descriptors.keys():
+            return True
+
+        for specy_id, (area, height, number_of_elements) in descriptors.items():
+            last_area, last_height, last_number_of_elements = self.lit_descriptors[specy_id]
+            if (
+                number_of_elements != last_number_of_elements
+                or abs(area - last_area) > self.change_tolerance * abs(last_area)
+                or abs(height - last_height) > self.change_tolerance * abs(last_height)
+            ):
+                return True
+        return False
+
+    def flush(self):
+        """Waits until all geometric files are written, to call at the end of the simulation with async_writegeo 
+        or the "store" format, and writes the metrics of the last run
+        """        
+        if self.writer is not None:
+            self.writer.flush()
+        if self.writegeo and self.writegeo_format == "store":
+            self.store.flush()
+        self.write_metrics()
+
+    def geometry_key(self, scenes, stems):
+        """Content hash of the geometry
+
+        Parameters
+        ----------
+        scenes : list
+            geometric scenes
+        stems : list of tuple
+            stems id
+
+        Returns
+        -------
+        str
+            hexadecimal digest of the scenes, stems, transformations and domain
+        """        
+        digest = hashlib.blake2b(digest_size=20)
+        for scene in scenes:
+            if isinstance(scene, plantgl.Scene):
+                for shp in scene:
+                    digest.update(repr(shp.id).encode())
+                    digest.update(shape_triangles(shp).tobytes())
+            elif isinstance(scene, dict):
+                digest.update(self.dict_scene_digest(scene).encode())
+            else:
+                digest.update(repr(scene).encode())
+            digest.update(b"|")
+
+        digest.update(repr((self.domain, self.transformations, stems)).encode())
+        return digest.hexdigest()
+
+    def scenes_fingerprint(self, scenes, stems):
+        """Cheap fingerprint of the geometry, without tesselation of plantgl scenes
+
+        Note
+        ----
+        plantgl scenes are summarized by ``Planter.scene_fingerprint``, dict scenes by the hash of their arrays
+
+        Parameters
+        ----------
+        scenes : list
+            geometric scenes
+        stems : list of tuple
+            stems id
+
+        Returns
+        -------
+        tuple
+            fingerprint of the scenes, stems, transformations and domain
+        """        
+        fingerprint = []
+        for scene in scenes:
+            if isinstance(scene, plantgl.Scene):
+                fingerprint.append(Planter.scene_fingerprint(scene))
+            elif isinstance(scene, dict):
+                fingerprint.append(self.dict_scene_digest(scene))
+            else:
+                fingerprint.append(repr(scene))
+        return (tuple(fingerprint), repr((self.domain, self.transformations, stems)))
+
+    @staticmethod
+    def dict_scene_digest(scene):
+        """Content hash of a dict scene, triangles or voxels
+
+        Parameters
+        ----------
+        scene : dict
+            ``{organ id : list of triangles}`` or voxels scene
+
+        Returns
+        -------
+        str
+            hexadecimal digest of the scene entries
+        """        
+        digest = hashlib.blake2b(digest_size=20)
+        for name, value in scene.items():
+            digest.update(repr(name).encode())
+            digest.update(numpy.asarray(value, dtype=float).tobytes())
+        return digest.hexdigest()
+
+    def results_key(self, energy, day, hour, parunit):
+        """Content hash of the lighting inputs
+
+        Parameters
+        ----------
+        energy : float
+            radiation input
+        day : int
+            day of the year
+        hour : int
+            timestep hour
+        parunit : str
+            radiation unit
+
+        Returns
+        -------
+        str
+            hexadecimal digest of the current geometry, sky and sun parameters and energy
+        """        
+        # without sun, the lighting does not depend on the day and hour
+        if self.direct:
+            sun = (day, hour)
+        else:
+            sun = None
+        parameters = (self.geometry_hash, self.lightmodel, self.environment, energy, sun, parunit)
+        return hashlib.blake2b(repr(parameters).encode(), digest_size=20).hexdigest()
+
+    @staticmethod
+    def dated_results(results, day, hour):
+        """Sets the day and hour of cached results, lightings without sun are cached for all days and hours
+
+        Parameters
+        ----------
+        results : dict
+            each entry is {output name in LIGHT_OUTPUTS : output}
+        day : int
+            day of the year
+        hour : int
+            timestep hour
+
+        Returns
+        -------
+        dict
+            results with "Day" and "Hour" columns of dataframes set to day and hour, other outputs are not copied
+        """        
+        dated = {}
+        for name, value in results.items():
+            if isinstance(value, pandas.DataFrame):
+                value = value.assign(**{c: t for c, t in (("Day", day), ("Hour", hour)) if c in value.columns})
+            dated[name] = value
+        return dated
+
+    def __store_results(self, key):
+        """Copies the current LightVegeManager outputs in the LRU cache, then evicts the oldest entries
+
+        Parameters
+        ----------
+        key : str
+            content hash of the lighting inputs, see ``results_key``
+        """        
+        results = self.__snapshot_results()
+        self.results_cache[key] = (results, self.results_memory(results))
+        while len(self.results_cache) > self.cache_size or (
+            self.cache_memory is not None
+            and len(self.results_cache) > 1
+            and sum(memory for _, memory in self.results_cache.values()) > self.cache_memory
+        ):
+            self.results_cache.popitem(last=False)
+
+    def __snapshot_results(self):
+        """Copies the current LightVegeManager outputs
+
+        Returns
+        -------
+        dict
+            each entry is {output name in LIGHT_OUTPUTS : copy of the output or the raised error}
+        """        
+        results = {}
+        for name, output in LIGHT_OUTPUTS.items():
+            try:
+                value = output(self.light)
+            except Exception as error:
+                # raised again when the output is read, like without cache
+                value = error
+            results[name] = value.copy() if hasattr(value, "copy") and not isinstance(value, dict) else copy.deepcopy(value)
+        return results
+
+    def organs_layers(self, organs_results):
+        """Adds the horizontal layer of each organ in lighting results, layers are ``voxels_size[2]`` thick
+
+        Parameters
+        ----------
+        organs_results : pandas.Dataframe
+            lighting results at organ scale
+
+        Returns
+        -------
+        pandas.Dataframe
+            copy of organs_results with a "Layer" column, -1 for organs without triangles
+        """        
+        triangles, species, organs = self.geometry_triangles()
+        heights = (
+            pandas.DataFrame({"VegetationType": species, "Organ": organs, "z": triangles[:, :, 2].mean(axis=1)})
+            .groupby(["VegetationType", "Organ"])["z"]
+            .mean()
+        )
+        layers = numpy.floor(heights / self.hybrid_layer_thickness).astype(int).rename("Layer")
+        results = organs_results.join(layers, on=["VegetationType", "Organ"])
+        results["Layer"] = results["Layer"].fillna(-1).astype(int)
+        return results
+
+    def hybrid_correction(self, caribu_results, ratp_results):
+        """Correction factors from RATP to CARIBU organ results per specy and layer
+
+        Note
+        ----
+        Factors are the ratios of area weighted sums, "par Eabs" of CARIBU over "PARa" of RATP and "par Ei" of CARIBU
+        over "Intercepted" of RATP
+
+        Parameters
+        ----------
+        caribu_results : pandas.Dataframe
+            CARIBU lighting results at organ scale
+        ratp_results : pandas.Dataframe
+            RATP lighting results at organ scale of the same geometry
+
+        Returns
+        -------
+        dict
+            "layer" and "specy" entries are pandas.Dataframe of "par Eabs" and "par Ei" factors indexed by 
+            (VegetationType, Layer) and VegetationType
+        """        
+        organs = self.organs_layers(caribu_results)[["VegetationType", "Organ", "Layer", "Area", "par Eabs", "par Ei"]].merge(
+            ratp_results[["VegetationType", "Organ", "PARa", "Intercepted"]], on=["VegetationType", "Organ"]
+        )
+        weighted = organs[["VegetationType", "Layer"]].assign(
+            **{c: organs[c] * organs["Area"] for c in ("par Eabs", "par Ei", "PARa", "Intercepted")}
+        )
+
+        factors = {}
+        for scale, groups in (("layer", ["VegetationType", "Layer"]), ("specy", ["VegetationType"])):
+            sums = weighted.groupby(groups)[["par Eabs", "par Ei", "PARa", "Intercepted"]].sum()
+            factors[scale] = pandas.DataFrame(
+                {
+                    "par Eabs": sums["par Eabs"] / sums["PARa"].where(sums["PARa"] > 0),
+                    "par Ei": sums["par Ei"] / sums["Intercepted"].where(sums["Intercepted"] > 0),
+                }
+            )
+        return factors
+
+    def hybrid_organs(self, ratp_results):
+        """RATP organ results corrected to CARIBU results with the factors of the last CARIBU lighting
+
+        Note
+        ----
+        Layers without factor use the factor of their specy, species without factor a factor of 1
+
+        Parameters
+        ----------
+        ratp_results : pandas.Dataframe
+            RATP lighting results at organ scale
+
+        Returns
+        -------
+        pandas.Dataframe
+            ratp_results with "par Eabs" and "par Ei" columns
+        """        
+        results = self.organs_layers(ratp_results)
+        layer_factors = results.join(self.hybrid_factors["layer"], on=["VegetationType", "Layer"])
+        specy_factors = results.join(self.hybrid_factors["specy"], on="VegetationType")
+        for c, ratp_c in (("par Eabs", "PARa"), ("par Ei", "Intercepted")):
+            factor = layer_factors[c].fillna(specy_factors[c]).fillna(1.0)
+            results[c] = results[ratp_c] * factor
+        return results.drop(columns="Layer")
+
+    @staticmethod
+    def results_memory(results):
+        """Memory size of lighting results
+
+        Parameters
+        ----------
+        results : dict
+            lighting outputs
+
+        Returns
+        -------
+        int
+            size in bytes
+        """        
+        memory = 0
+        for value in results.values():
+            if hasattr(value, "memory_usage"):
+                memory += int(value.memory_usage(deep=True).sum())
+            elif isinstance(value, numpy.ndarray):
+                memory += value.nbytes
+            else:
+                memory += sys.getsizeof(value)
+        return memory
+
+    def __output(self, name):
+        """LightVegeManager output of the current run, or the cached output if the run was found in the cache
+
+        Parameters
+        ----------
+        name : str
+            output name in LIGHT_OUTPUTS
+
+        Returns
+        -------
+        pandas.Dataframe, numpy.array, dict or int
+            lighting output
+        """        
+        start = time.perf_counter()
+        try:
+            if self.current_results is None:
+                return LIGHT_OUTPUTS[name](self.light)
+            value = self.current_results[name]
+        finally:
+            self.add_time("extraction time", start)
+
+        if isinstance(value, Exception):
+            raise value
+        return value
+
+    def run_timesteps(self, timesteps, parunit="RG", columns=None):
+        """Lights the current geometry at several timesteps and stacks organ results in arrays
+
+        Note
+        ----
+        The geometry is built once by LightVegeManager for all timesteps, see ``build``. These lightings are not 
+        cached, written or counted in metrics and the accessors keep returning the results of the last ``run``.
+
+        Parameters
+        ----------
+        timesteps : list of tuple
+            each element is (day, hour, energy)
+        parunit : str, optional
+            possibility to precise the radiation unit, by default "RG"
+        columns : list of str, optional
+            organ results to stack, by default None for all numeric results columns
+
+        Returns
+        -------
+        dict
+            "VegetationType" and "Organ" arrays identify each organ (row), "day", "hour" and "energy" arrays each
+            timestep (column), and each entry of columns is an array of dimensions (number of organs, number of timesteps)
+        """        
+        if self.geometry is None:
+            raise ValueError("no geometry to light, call build before run_timesteps")
+
+        # results of the last run, LightVegeManager outputs are replaced by the timesteps lightings
+        saved_results = self.current_results if self.current_results is not None else self.__snapshot_results()
+        if self.dirty_geometry():
+            self.light.build(self.geometry)
+            self.built_geometry_fingerprint = self.geometry_fingerprint
+
+        index_columns = ["VegetationType", "Organ"]
+        organs_index = None
+        stacked = {}
+        for day, hour, energy in timesteps:
+            self.light.run(energy=energy, day=day, hour=hour, truesolartime=True, parunit=parunit)
+            results = self.light.elements_outputs.set_index(index_columns)
+
+            if organs_index is None:
+                organs_index = results.index
+                if columns is None:
+                    columns = [
+                        c for c in results.select_dtypes(include="number").columns if c not in ("Day", "Hour")
+                    ]
+                stacked = {c: [] for c in columns}
+
+            results = results.reindex(organs_index)
+            for c in columns:
+                stacked[c].append(results[c].to_numpy(dtype=float))
+        self.current_results = saved_results
+
+        timesteps = numpy.array(timesteps, dtype=float).reshape(-1, 3)
+        output = {
+            "VegetationType": numpy.array(organs_index.get_level_values(0)) if organs_index is not None else numpy.zeros(0),
+            "Organ": numpy.array(organs_index.get_level_values(1)) if organs_index is not None else numpy.zeros(0),
+            "day": timesteps[:, 0],
+            "hour": timesteps[:, 1],
+            "energy": timesteps[:, 2],
+        }
+        for c, values in stacked.items():
+            output[c] = numpy.stack(values, axis=1)
+        return output
+
+    def sun_course(self, day, parunit="RG"):
+        """Lights the current geometry at each hour of ``sun_course_hours`` with an energy of 1
+
+        Note
+        ----
+        The sun course is lit once per day and per geometry, see ``run_timesteps``: it is lit again when the 
+        geometry fingerprint changes within the day.
+
+        Parameters
+        ----------
+        day : int
+            day of the year
+        parunit : str, optional
+            possibility to precise the radiation unit, by default "RG"
+
+        Returns
+        -------
+        dict
+            stacked organ results, see ``run_timesteps``
+        """        
+        key = (day, parunit, self.geometry_fingerprint)
+        if key != self.sun_course_key:
+            self.sun_course_results = self.run_timesteps([(day, hour, 1.0) for hour in self.sun_course_hours], parunit)
+            self.sun_course_key = key
+        return self.sun_course_results
+
+    def interpolated_organs(self, day, hour, column, global_index=None, parunit="RG"):
+        """Organ results of the sun course linearly interpolated at one hour
+
+        Parameters
+        ----------
+        day : int
+            day of the year
+        hour : float
+            hour of the day, out of the sun course hours the results of the first or last hour are returned
+        column : str
+            organ results column, for example "par Eabs" or "Intercepted"
+        global_index : int, optional
+            specy ID in simulation, by default None for all species
+        parunit : str, optional
+            possibility to precise the radiation unit, by default "RG"
+
+        Returns
+        -------
+        dict
+            each entry is {organ id : interpolated value}, organs missing from the sun course are left out
+        """        
+        course = self.sun_course(day, parunit)
+        hours = course["hour"]
+        values = course[column]
+
+        # linear interpolation between the two sun course hours around hour
+        i_after = int(numpy.clip(numpy.searchsorted(hours, hour), 1, len(hours) - 1)) if len(hours) > 1 else 0
+        i_before = max(i_after - 1, 0)
+        if hours[i_after] > hours[i_before]:
+            weight = float(numpy.clip((hour - hours[i_before]) / (hours[i_after] - hours[i_before]), 0.0, 1.0))
+        else:
+            weight = 0.0
+        interpolated = (1.0 - weight) * values[:, i_before] + weight * values[:, i_after]
+
+        # organs absent at one of the two hours have no value
+        organs = numpy.isfinite(interpolated)
+        if global_index is not None:
+            organs &= course["VegetationType"] == global_index
+        return dict(zip(course["Organ"][organs].tolist(), interpolated[organs].tolist()))
+
+    @staticmethod
+    def is_flat_triangles(scene):
+        """Check if a scene is a canopy of flat triangles arrays generated by Planter
+
+        Parameters
+        ----------
+        scene : plantgl.Scene, dict or other geometric scene
+            geometric scene
+
+        Returns
+        -------
+        bool
+            True if scene is a dict with "triangles" and "organs" arrays
+        """        
+        return isinstance(scene, dict) and "triangles" in scene and "organs" in scene
+
+    @staticmethod
+    def flat_triangles_scene(canopy):
+        """Convert flat triangles arrays to a LightVegeManager triangles scene
+
+        Parameters
+        ----------
+        canopy : dict
+            ``{"triangles": (n_triangles, 3, 3) array, "organs": organ id per triangle, ...}``
+
+        Returns
+        -------
+        dict
+            ``{organ id : list of triangles}``
+        """        
+        organs = numpy.asarray(canopy["organs"])
+        order = numpy.argsort(organs, kind="stable")
+        organs_id, first_triangles = numpy.unique(organs[order], return_index=True)
+        triangles = numpy.asarray(canopy["triangles"])[order]
+        return {
+            int(organ_id): organ_triangles.tolist()
+            for organ_id, organ_triangles in zip(organs_id, numpy.split(triangles, first_triangles[1:]))
+        }
+
+    @staticmethod
+    def flat_triangles_instances(canopy):
+        """Split flat triangles arrays in organ instances, one per plant and organ id
+
+        Parameters
+        ----------
+        canopy : dict
+            ``{"triangles": (n_triangles, 3, 3) array, "organs": organ id per triangle, "plants": plant number per triangle}``,
+            without "plants" all triangles belong to one plant
+
+        Returns
+        -------
+        list of tuple
+            each element is (organ id, triangles of the instance), triangles keep their order in the canopy
+        """        
+        organs = numpy.asarray(canopy["organs"])
+        if len(organs) == 0:
+            return []
+        plants = numpy.asarray(canopy.get("plants", numpy.zeros(len(organs), dtype=int)))
+        order = numpy.lexsort((organs, plants))
+        keys = numpy.stack((plants[order], organs[order]), axis=1)
+        starts = numpy.flatnonzero(numpy.any(keys[1:] != keys[:-1], axis=1)) + 1
+        triangles = numpy.asarray(canopy["triangles"], dtype=float)[order]
+        return [
+            (int(organ_id), instance_triangles)
+            for organ_id, instance_triangles in zip(organs[order][numpy.r_[0, starts]], numpy.split(triangles, starts))
+        ]
+
+    def decimate_scenes(self, scenes):
+        """Decimates each organ mesh of the scenes to at most ``decimation_target`` triangles
+
+        Note
+        ----
+        Each organ instance is decimated alone: each shape of a plantgl.Scene, each (plant, organ) of flat triangles 
+        arrays and each organ of ``{organ id : list of triangles}``, so triangles of different plant copies sharing 
+        an organ id are never merged. Organ areas are kept, see ``decimate_triangles``. Voxels scenes are not modified. 
+        Decimated scenes are kept for the last scenes fingerprint, see ``scenes_fingerprint``. The errors are stored 
+        in ``decimation_report`` with the following entries: "triangles before", "triangles after", "area", 
+        "height profile error" the fraction of area moved to another of 10 height layers and "inclination error" 
+        the difference of area weighted mean leaf inclination in degrees
+
+        Parameters
+        ----------
+        scenes : list
+            geometric scenes, plantgl.Scene, flat triangles arrays from Planter or ``{organ id : list of triangles}``
+
+        Returns
+        -------
+        list
+            scenes with triangles scenes as ``{organ id : list of triangles}``
+        """        
+        fingerprint = self.scenes_fingerprint(scenes, None)
+        if self.decimation_cache is not None and self.decimation_cache[0] == fingerprint:
+            return self.decimation_cache[1]
+
+        before, after = [], []
+        decimated_scenes = []
+        for scene in scenes:
+            if isinstance(scene, plantgl.Scene):
+                instances = [(shp.id, shape_triangles(shp)) for shp in scene]
+            elif self.is_flat_triangles(scene):
+                instances = self.flat_triangles_instances(scene)
+            elif isinstance(scene, dict) and "LA" not in scene:
+                instances = [(organ_id, numpy.asarray(triangles, dtype=float)) for organ_id, triangles in scene.items()]
+            else:
+                decimated_scenes.append(scene)
+                continue
+
+            decimated = {}
+            for organ_id, triangles in instances:
+                triangles = triangles.reshape(-1, 3, 3)
+                keep_ratio = min(1.0, self.decimation_target / max(len(triangles), 1))
+                kept = decimate_triangles(triangles, keep_ratio)
+                decimated.setdefault(organ_id, []).append(kept)
+                before.append(triangles)
+                after.append(kept)
+            decimated_scenes.append(
+                {organ_id: numpy.concatenate(triangles).tolist() for organ_id, triangles in decimated.items()}
+            )
+
+        if before:
+            before, after = numpy.concatenate(before), numpy.concatenate(after)
+            areas_before, inclinations_before = self.triangles_area_inclination(before)
+            areas_after, inclinations_after = self.triangles_area_inclination(after)
+            area_before, area_after = areas_before.sum(), areas_after.sum()
+
+            # vertical distribution of the area in layers of the canopy height
+            heights_before, heights_after = before[:, :, 2].mean(axis=1), after[:, :, 2].mean(axis=1)
+            layers = (heights_before.min(), heights_before.max())
+            heights_after = numpy.clip(heights_after, *layers)
+            profile_before = numpy.histogram(heights_before, bins=10, range=layers, weights=areas_before)[0]
+            profile_after = numpy.histogram(heights_after, bins=10, range=layers, weights=areas_after)[0]
+
+            self.decimation_report = {
+                "triangles before": len(areas_before),
+                "triangles after": len(areas_after),
+                "area": area_before,
+                "height profile error": (
+                    0.5 * numpy.abs(profile_after - profile_before).sum() / area_before if area_before > 0 else 0.0
+                ),
+                "inclination error": abs(
+                    numpy.average(inclinations_after, weights=areas_after if area_after > 0 else None)
+                    - numpy.average(inclinations_before, weights=areas_before if area_before > 0 else None)
+                ),
+            }
+
+        self.decimation_cache = (fingerprint, decimated_scenes)
+        return decimated_scenes
+
+    @staticmethod
+    def triangles_area_inclination(triangles):
+        """Area and inclination of triangles
+
+        Parameters
+        ----------
+        triangles : numpy.array
+            vertices of each triangle, dimensions (number of triangles, 3, 3)
+
+        Returns
+        -------
+        numpy.array, numpy.array
+            area and inclination from the horizontal plane in degrees of each triangle
+        """        
+        normals = numpy.cross(triangles[:, 1] - triangles[:, 0], triangles[:, 2] - triangles[:, 0])
+        norms = numpy.linalg.norm(normals, axis=1)
+        cos_inclination = numpy.divide(numpy.abs(normals[:, 2]), norms, out=numpy.ones(len(norms)), where=norms > 0)
+        return 0.5 * norms, numpy.degrees(numpy.arccos(numpy.clip(cos_inclination, 0.0, 1.0)))
 
     def results_organs(self):
         """Return lighting results at organ scale
@@ -272,10 +1478,62 @@ class Light_wrapper(object):
             lighting results at organ scale
         """        
         try:
-            return self.light.elements_outputs
+            return self.__output("organs")
         except AttributeError:
             return None
 
+    def organs_view(self):
+        """Return lighting results at organ scale as numpy columns grouped by specy, converted once per lighting
+
+        Returns
+        -------
+        OrganResults or None
+            lighting results at organ scale, None without organ results
+        """        
+        organs_results = self.results_organs()
+        if organs_results is None or organs_results.empty or "VegetationType" not in organs_results.columns:
+            return None
+        if self.organs_view_cache is None or self.organs_view_cache[0] is not organs_results:
+            self.organs_view_cache = (organs_results, OrganResults(organs_results))
+        return self.organs_view_cache[1]
+
+    def field_results(self, column=None):
+        """Return lighting results per specy summed over the tile and extrapolated to the field
+
+        Note
+        ----
+        Without a periodic tile, the field is the soil domain and both results are equal
+
+        Parameters
+        ----------
+        column : str, optional
+            organ results column of absorbed energy per area, by default None for "par Eabs" with CARIBU and "PARa" 
+            with RATP or RiRi5
+
+        Returns
+        -------
+        pandas.Dataframe
+            columns "VegetationType", "Area tile", "Eabs tile", "Area field", "Eabs field", areas in m² and 
+            absorbed energy in the unit of the run energy
+        """        
+        results = self.results_organs()
+        if results is None:
+            return None
+
+        if column is None:
+            column = "par Eabs" if self.lightmodel == "caribu" else "PARa"
+
+        species = results["VegetationType"]
+        tile = (
+            results.assign(**{"Area tile": results["Area"], "Eabs tile": results["Area"] * results[column]})
+            .groupby(species)[["Area tile", "Eabs tile"]]
+            .sum()
+            .reset_index()
+        )
+        tile["Area field"] = tile["Area tile"] * self.tile_replications
+        tile["Eabs field"] = tile["Eabs tile"] * self.tile_replications
+        return tile
+
     def results_voxels(self):
         """Return lighting results at voxels scale
 
@@ -284,7 +1542,7 @@ class Light_wrapper(object):
         pandas.Dataframe
             lighting results at voxels scale
         """         
-        return self.light.voxels_outputs
+        return self.__output("voxels")
 
     def results_triangles(self):
         """Return lighting results at triangles scale
@@ -294,7 +1552,7 @@ class Light_wrapper(object):
         pandas.Dataframe
             lighting results at triangles scale
         """         
-        return self.light.triangles_outputs
+        return self.__output("triangles")
 
     def results_sensors(self):
         """Return lighting results of virtual sensors
@@ -304,7 +1562,56 @@ class Light_wrapper(object):
         pandas.Dataframe
             lighting results of virtual sensors
         """         
-        return self.light.sensors_outputs(dataframe=True)
+        return self.__output("sensors")
+
+    def sensors_arrays(self):
+        """Return PAR of virtual sensors as arrays following the sensors grids, converted once per lighting
+
+        Note
+        ----
+        Sensors grids are registered at construction, see ``sensors_grid`` for the layout of lighting results
+
+        Returns
+        -------
+        dict
+            each entry is {sensors grid specy ID : numpy.array of dimensions [iz, iy, ix]}, iz = 0 is the lowest layer
+        """        
+        if self.sensors_arrays_cache is None:
+            sensors = self.results_sensors()
+            self.sensors_arrays_cache = {
+                specy_id: self.sensors_grid(sensors, specy_id, nxyz[:2])
+                for specy_id, (nxyz, dxyz, origin) in self.sensors_layouts.items()
+            }
+        return self.sensors_arrays_cache
+
+    @staticmethod
+    def sensors_grid(sensors, specy_id, nxy):
+        """Reshape PAR of one grid of virtual sensors from lighting results to an array
+
+        Note
+        ----
+        LightVegeManager writes the sensors of a grid ordered by x, then y, then z from the ground, and only keeps 
+        the z layers below the top of the canopy. The number of z layers is then the number of sensors per (x, y) 
+        column, which is the number of non empty layers of the l-egume grid.
+
+        Parameters
+        ----------
+        sensors : pandas.Dataframe
+            lighting results of sensors with "VegetationType" and "PAR" columns
+        specy_id : int
+            specy ID of the sensors grid
+        nxy : list of int
+            number of sensors along x and y
+
+        Returns
+        -------
+        numpy.array
+            PAR of sensors, dimensions [iz, iy, ix], iz = 0 is the lowest layer
+        """        
+        values = sensors[sensors.VegetationType == specy_id]["PAR"].to_numpy(dtype=float)
+        column_size = nxy[0] * nxy[1]
+        values = values[: (len(values) // column_size) * column_size]
+        return values.reshape(nxy[0], nxy[1], -1).transpose(2, 1, 0)
 
     def res_trans(self):
         """Return transmitted energy per voxel
@@ -314,7 +1621,7 @@ class Light_wrapper(object):
         numpy.array
             transmitted energy per voxel dimensions [iz, iy, ix]
         """        
-        return self.light.riri5_transmitted_light
+        return self.__output("transmitted")
 
     def res_abs_i(self):
         """Return absorbed energy per voxel per specy
@@ -324,7 +1631,7 @@ class Light_wrapper(object):
         numpy.array
             absorbed energy per voxel dimensions [specy id, iz, iy, ix]
         """        
-        return self.light.riri5_intercepted_light
+        return self.__output("intercepted")
 
     def soil_energy(self):
         """Relative energy intercepted by soil
@@ -335,7 +1642,7 @@ class Light_wrapper(object):
             Relative energy intercepted by soil [0-1]
         """        
         try:
-            return self.light.soilenergy["Qi"]
+            return self.__output("soil")["Qi"]
         except AttributeError:
             return -1
 
@@ -347,7 +1654,7 @@ class Light_wrapper(object):
         int
             Number of empty z layers in voxel grid
         """        
-        return self.light.legume_empty_layers
+        return self.__output("empty layers")
 
     def xydomain_lightvegemanager(self):
         """Return soil domain computed by lightvegemanager
@@ -357,7 +1664,7 @@ class Light_wrapper(object):
         tuple of tuple
             ((xmin, ymin), (xmax, ymax))
         """        
-        return self.light.domain
+        return self.__output("domain")
     
     def plantgl(self, lighting=False, printtriangles=True, printvoxels=False):
         """Return plantGL scene of LightVegeManager mesh
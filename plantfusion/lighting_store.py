@@ -0,0 +1,266 @@
+"""
+
+    contains LightingStore class and the conversion of a store to VTK files
+
+"""
+
+import atexit
+import glob
+import os
+
+import numpy
+
+
+class LightingStore:
+    """Time series of lit geometries in one folder of numpy files
+
+    Note
+    ----
+    Triangles are written once per geometry in ``geometry_<i>.npz``, lighting results of the organs are written
+    as compressed chunks of ``chunk_size`` steps in ``steps_<i>.npz``. Use ``store_to_vtk`` for visualisation.
+
+    Parameters
+    ----------
+    folder : str
+        store folder path, created if it does not exist
+    chunk_size : int, optional
+        number of lighting steps per chunk file, by default 100
+
+    """
+    def __init__(self, folder, chunk_size=100) -> None:
+        """Constructor, creates the store folder
+
+        """
+        self.folder = os.path.normpath(folder)
+        os.makedirs(self.folder, exist_ok=True)
+        self.chunk_size = chunk_size
+
+        self.geometries: dict = {}
+        self.steps: list = []
+        self.number_of_steps = 0
+        self.number_of_chunks = 0
+        atexit.register(self.flush)
+
+    def add_geometry(self, key, triangles, species, organs):
+        """Writes a geometry if it is not already in the store
+
+        Parameters
+        ----------
+        key : str
+            content hash of the geometry
+        triangles : numpy.array
+            vertices of each triangle, dimensions (number of triangles, 3, 3)
+        species : numpy.array
+            specy ID of each triangle
+        organs : numpy.array
+            organ ID of each triangle
+
+        Returns
+        -------
+        int
+            geometry number in the store
+        """
+        if key not in self.geometries:
+            self.geometries[key] = len(self.geometries)
+            numpy.savez_compressed(
+                os.path.join(self.folder, "geometry_{}.npz".format(self.geometries[key])),
+                triangles=numpy.asarray(triangles, dtype=numpy.float32).reshape(-1, 3, 3),
+                species=numpy.asarray(species, dtype=numpy.int32),
+                organs=numpy.asarray(organs, dtype=numpy.int64),
+            )
+        return self.geometries[key]
+
+    def append(self, day, hour, geometry, organs_results):
+        """Adds the lighting results of one step, a chunk is written every ``chunk_size`` steps
+
+        Parameters
+        ----------
+        day : int
+            day of the year
+        hour : int
+            hour of the day
+        geometry : int
+            geometry number in the store, see ``add_geometry``
+        organs_results : pandas.Dataframe
+            lighting results at organ scale, with "VegetationType" and "Organ" columns
+        """
+        self.steps.append((self.number_of_steps, day, hour, geometry, organs_results))
+        self.number_of_steps += 1
+        if len(self.steps) >= self.chunk_size:
+            self.flush()
+
+    def flush(self):
+        """Writes the steps not yet written in a new chunk
+        """
+        if not self.steps:
+            return
+
+        columns = [
+            c
+            for c in self.steps[0][4].select_dtypes(include="number").columns
+            if c not in ("Day", "Hour", "VegetationType", "Organ")
+        ]
+        rows_per_step = [len(results) for *_, results in self.steps]
+        chunk = {
+            "step": numpy.array([s[0] for s in self.steps], dtype=numpy.int64),
+            "day": numpy.array([s[1] for s in self.steps], dtype=numpy.int32),
+            "hour": numpy.array([s[2] for s in self.steps], dtype=numpy.int32),
+            "geometry": numpy.array([s[3] for s in self.steps], dtype=numpy.int32),
+            # organ results of all steps are concatenated, the rows of step i start at offsets[i]
+            "offsets": numpy.concatenate(([0], numpy.cumsum(rows_per_step))).astype(numpy.int64),
+            "species": numpy.concatenate([s[4]["VegetationType"].to_numpy() for s in self.steps]).astype(numpy.int32),
+            "organs": numpy.concatenate([s[4]["Organ"].to_numpy() for s in self.steps]).astype(numpy.int64),
+            "columns": numpy.array(columns),
+        }
+        for i, c in enumerate(columns):
+            chunk["values_{}".format(i)] = numpy.concatenate(
+                [s[4][c].to_numpy(dtype=float) for s in self.steps]
+            ).astype(numpy.float32)
+
+        numpy.savez_compressed(os.path.join(self.folder, "steps_{}.npz".format(self.number_of_chunks)), **chunk)
+        self.number_of_chunks += 1
+        self.steps = []
+
+
+def read_store_steps(folder):
+    """Reads the lighting steps of a store
+
+    Parameters
+    ----------
+    folder : str
+        store folder path
+
+    Returns
+    -------
+    list of dict
+        each step is {"step", "day", "hour", "geometry", "species", "organs", "values": {column : array}}
+    """
+    chunk_files = glob.glob(os.path.join(folder, "steps_*.npz"))
+    chunk_files.sort(key=lambda f: int(os.path.splitext(os.path.basename(f))[0].split("_")[1]))
+
+    steps = []
+    for chunk_file in chunk_files:
+        with numpy.load(chunk_file) as chunk:
+            columns = chunk["columns"].tolist()
+            values = [chunk["values_{}".format(i)] for i in range(len(columns))]
+            offsets = chunk["offsets"]
+            for i in range(len(chunk["step"])):
+                rows = slice(offsets[i], offsets[i + 1])
+                steps.append(
+                    {
+                        "step": int(chunk["step"][i]),
+                        "day": int(chunk["day"][i]),
+                        "hour": int(chunk["hour"][i]),
+                        "geometry": int(chunk["geometry"][i]),
+                        "species": chunk["species"][rows],
+                        "organs": chunk["organs"][rows],
+                        "values": {c: v[rows] for c, v in zip(columns, values)},
+                    }
+                )
+    return steps
+
+
+def store_to_vtk(folder, out_folder=None):
+    """Converts a store to one legacy VTK file per lighting step, organ results are written on their triangles
+
+    Parameters
+    ----------
+    folder : str
+        store folder path
+    out_folder : str, optional
+        folder of the VTK files, by default None for the store folder
+
+    Returns
+    -------
+    list of str
+        paths of the written files
+    """
+    out_folder = folder if out_folder is None else out_folder
+    os.makedirs(out_folder, exist_ok=True)
+
+    geometries = {}
+    paths = []
+    for step in read_store_steps(folder):
+        if step["geometry"] not in geometries:
+            with numpy.load(os.path.join(folder, "geometry_{}.npz".format(step["geometry"]))) as geometry:
+                geometries[step["geometry"]] = {name: geometry[name] for name in geometry.files}
+        geometry = geometries[step["geometry"]]
+
+        path = os.path.join(out_folder, "plantfusion_{}.vtk".format(step["step"]))
+        write_vtk_organs(
+            path,
+            geometry["triangles"],
+            geometry["species"],
+            geometry["organs"],
+            step["species"],
+            step["organs"],
+            step["values"],
+        )
+        paths.append(path)
+    return paths
+
+
+def write_vtk_organs(path, triangles, species, organs, results_species, results_organs, values):
+    """Writes triangles and the lighting results of their organ in a legacy ASCII VTK file
+
+    Parameters
+    ----------
+    path : str
+        file path
+    triangles : numpy.array
+        vertices of each triangle, dimensions (number of triangles, 3, 3)
+    species : numpy.array
+        specy ID of each triangle
+    organs : numpy.array
+        organ ID of each triangle
+    results_species : numpy.array
+        specy ID of each organ result
+    results_organs : numpy.array
+        organ ID of each organ result
+    values : dict
+        each entry is {column : value of each organ result}, triangles without result get nan
+    """
+    # row of each triangle organ in the results
+    organs_rows = {
+        key: row for row, key in enumerate(zip(numpy.asarray(results_species).tolist(), numpy.asarray(results_organs).tolist()))
+    }
+    triangles_rows = numpy.array(
+        [organs_rows.get(key, -1) for key in zip(numpy.asarray(species).tolist(), numpy.asarray(organs).tolist())],
+        dtype=int,
+    )
+
+    write_vtk_triangles(
+        path,
+        triangles,
+        {
+            "VegetationType": species,
+            "Organ": organs,
+            **{c: numpy.where(triangles_rows >= 0, numpy.asarray(v)[triangles_rows], numpy.nan) for c, v in values.items()},
+        },
+    )
+
+
+def write_vtk_triangles(path, triangles, cell_data):
+    """Writes triangles and their values in a legacy ASCII VTK file
+
+    Parameters
+    ----------
+    path : str
+        file path
+    triangles : numpy.array
+        vertices of each triangle, dimensions (number of triangles, 3, 3)
+    cell_data : dict
+        each entry is {name : value of each triangle}
+    """
+    triangles = numpy.asarray(triangles).reshape(-1, 3, 3)
+    n_triangles = len(triangles)
+    with open(path, "w") as file:
+        file.write("# vtk DataFile Version 3.0\nplantfusion lighting\nASCII\nDATASET POLYDATA\n")
+        file.write("POINTS {} float\n".format(3 * n_triangles))
+        numpy.savetxt(file, triangles.reshape(-1, 3), fmt="%g")
+        file.write("POLYGONS {} {}\n".format(n_triangles, 4 * n_triangles))
+        numpy.savetxt(file, numpy.column_stack((numpy.full(n_triangles, 3), numpy.arange(3 * n_triangles).reshape(-1, 3))), fmt="%d")
+        file.write("CELL_DATA {}\n".format(n_triangles))
+        for name, values in cell_data.items():
+            file.write("SCALARS {} float 1\nLOOKUP_TABLE default\n".format(name.replace(" ", "_")))
+            numpy.savetxt(file, numpy.asarray(values, dtype=float), fmt="%g")
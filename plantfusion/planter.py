@@ -6,12 +6,12 @@
 
 import numpy
 import math
-import pandas
 
 import openalea.plantgl.all as plantgl
 import random
 
 from plantfusion.indexer import Indexer
+from plantfusion.utils import load_npz
 
 
 class Planter:
@@ -23,7 +23,7 @@ class Planter:
         
         * soil domain
 
-    You can choose between 3 generation types:
+    You can choose between 4 generation types:
 
         * "default": each instance of fspm wrapper manages its plant positions, manages only soil domain
 
@@ -31,10 +31,12 @@ class Planter:
 
         * "row": generates two rows for each plant specy in a squared soil
 
+        * "tile": generates one representative tile with "random" or "row" positions, declared periodic over a larger field
+
     Parameters
     ----------
     generation_type : str, optional
-        choose between "default", "random" or "row", by default "default"
+        choose between "default", "random", "row" or "tile", by default "default"
     indexer : Indexer, optional
         indexer for listing FSPM in the simulation, by default Indexer()
     legume_cote : dict, optional
@@ -57,6 +59,22 @@ class Planter:
         avoid to regenerate wheat positions at each timestep, by default False
     seed : int, optional
         seed for random and numpy, by default None
+    cache_canopy : bool, optional
+        returns the previous wheat canopy when the wheat geometry, the positions and the perturbations did not change, by default True
+    incremental_canopy : bool, optional
+        only instantiates again the wheat shapes whose geometry changed since the previous canopy, by default False
+    canopy_output : str, optional
+        wheat canopy output, choose between "plantgl" for a plantgl.Scene or "triangles" for flat arrays of triangles, by default "plantgl"
+    transform_engine : str, optional
+        how duplicated shapes are transformed in a plantgl canopy, choose between "plantgl" for chained plantgl transformations or "matrix" for vertices transformed by one affine matrix, by default "plantgl"
+    tile_arrangement : str, optional
+        plant positions inside the tile for "tile" generation type, choose between "random" or "row", by default "row"
+    field_length : float, optional
+        side length in m of the field covered by the tile for "tile" generation type, by default None for the tile itself
+    lod_core_fraction : float, optional
+        level of detail of the wheat canopy, fraction of the domain side around its center where plants keep their full geometry, plants outside get simplified meshes. By default None, all plants have their full geometry
+    lod_keep_ratio : float, optional
+        fraction of triangles kept in the simplified meshes, by default 0.25
 
     """    
     def __init__(
@@ -73,6 +91,14 @@ class Planter:
         noise_plant_positions=0.0,
         save_wheat_positions=False,
         seed=None,
+        cache_canopy=True,
+        incremental_canopy=False,
+        canopy_output="plantgl",
+        transform_engine="plantgl",
+        tile_arrangement="row",
+        field_length=None,
+        lod_core_fraction=None,
+        lod_keep_ratio=0.25,
     ) -> None:
         """Constructor, computes a global soil domain for the simulation
 
@@ -80,9 +106,22 @@ class Planter:
         self.generation_type = generation_type
         self.plant_density = plant_density
         self.save_wheat_positions = save_wheat_positions
+        self.seed = seed
         self.noise_plant_positions = noise_plant_positions
         self.indexer = indexer
         self.number_of_plants: list = [0 for i in indexer.global_order]
+        self.leaf_perturbations_tables: dict = {}
+        self.cache_canopy = cache_canopy
+        self.canopy_cache: dict = {}
+        self.incremental_canopy = incremental_canopy
+        self.canopy_instances: dict = {}
+        self.canopy_output = canopy_output
+        self.transform_engine = transform_engine
+        self.lod_core_fraction = lod_core_fraction
+        self.lod_keep_ratio = lod_keep_ratio
+        self.simplified_shapes: dict = {}
+        self.invalidate_stands()
+        self.__spatial_index = None
 
         # les lsystem l-egume sont par défaut en cm et le reste en m
         self.transformations: dict = {"scenes unit": {}}
@@ -104,6 +143,66 @@ class Planter:
             self.__row(plant_density, inter_rows)
             self.type_domain = "mix"
 
+        elif generation_type == "tile":
+            if tile_arrangement == "row":
+                self.__row(plant_density, inter_rows)
+            elif tile_arrangement == "random":
+                self.__random(plant_density, xy_square_length)
+            else:
+                raise ValueError("tile_arrangement must be random or row")
+            self.type_domain = "mix"
+
+        self.__periodic_tile(generation_type == "tile", tile_arrangement, field_length)
+
+    def __periodic_tile(self, periodic, tile_arrangement, field_length):
+        """Declares the soil domain as a periodic tile of a larger field
+
+        Note
+        ----
+        The lighting runs on the tile with infinite replication and the soil grid covers the tile, results
+        per tile are extrapolated to the field with ``tile_replications``
+
+        Parameters
+        ----------
+        periodic : bool
+            if the soil domain is a representative tile
+        tile_arrangement : str
+            plant positions inside the tile, "random" or "row"
+        field_length : float
+            side length of the field in m, None for the tile itself
+        """        
+        self.periodic = periodic
+        self.tile_arrangement = tile_arrangement if periodic else None
+
+        if not hasattr(self, "domain"):
+            self.field_domain = None
+            self.tile_replications = 1.0
+            return
+
+        if periodic and field_length is not None:
+            self.field_domain = ((self.domain[0][0], self.domain[0][1]), (self.domain[0][0] + field_length, self.domain[0][1] + field_length))
+        else:
+            self.field_domain = self.domain
+
+        tile_area = (self.domain[1][0] - self.domain[0][0]) * (self.domain[1][1] - self.domain[0][1])
+        field_area = (self.field_domain[1][0] - self.field_domain[0][0]) * (self.field_domain[1][1] - self.field_domain[0][1])
+        self.tile_replications = field_area / tile_area
+
+    def extrapolate_to_field(self, tile_value):
+        """Extrapolates an extensive value computed on the tile to the whole field
+
+        Parameters
+        ----------
+        tile_value : float or numpy.array
+            value summed over the tile (energy, mass, area...)
+
+        Returns
+        -------
+        float or numpy.array
+            value over the field
+        """        
+        return tile_value * self.tile_replications
+
     def __random(self, plant_density, xy_square_length):
         """Parameters for random generation type
 
@@ -249,23 +348,11 @@ class Planter:
         
         # runs an iteration of Agronomic stand to get its soil domain
         if self.indexer.wheat_active:
-            from alinea.adel.Stand import AgronomicStand
-            
             self.type_domain = "create_heterogeneous_canopy"
             self.wheat_positions = [[] for i in range(len(self.indexer.wheat_names))]
 
             # on vient récupérer le domain de AgronomicStand
-            if seed is not None:
-                random.seed(seed)
-                numpy.random.seed(seed)
-
-            stand = AgronomicStand(
-                sowing_density=self.plant_density[1],
-                plant_density=self.plant_density[1],
-                inter_row=self.inter_rows,
-                noise=self.noise_plant_positions,
-            )
-            _, domain, _, _ = stand.smart_stand(nplants=50, at=self.inter_rows, convunit=1)
+            _, domain, _, _ = self.agronomic_stand(nplants=50, seed=seed)
             self.domain = domain
 
         # translate each specy scenes if precised
@@ -328,7 +415,7 @@ class Planter:
             self.domain = xy_plane
 
 
-    def generate_random_other(self, indice_instance=0, seed=None):
+    def generate_random_other(self, indice_instance=0, seed=None, as_array=False):
         """Compute random plant positions for fspm other than l-egume and wheat
 
         Parameters
@@ -337,34 +424,27 @@ class Planter:
             specy ID corresponding to plants to generate, by default 0
         seed : int, optional
             random seed, by default None
+        as_array : bool, optional
+            returns positions as a numpy.array instead of a list of tuple, by default False
 
         Returns
         -------
-        list of tuple
-            list of plant positions (x, y, z)
+        list of tuple or numpy.array
+            list of plant positions (x, y, z), or array of dimensions (number of plants, 3)
         """        
-        if seed is not None:
-            s = seed
-        else:
-            s = 1234
-        random.seed(s)
-        numpy.random.seed(s)
-
         # tirage des positions
-        # list de 3-tuple des positions
-        if self.other_positions[indice_instance] != [] :
+        if len(self.other_positions[indice_instance]) > 0:
             positions = self.other_positions[indice_instance]
         else:
-            positions = []
-            for i in range(self.number_of_plants[self.indexer.other_index[indice_instance]]):
-                positions.append(
-                    (numpy.random.uniform(0.0, self.domain[1][0]), numpy.random.uniform(0.0, self.domain[1][0]), 0.0)
-                )
+            global_index = self.indexer.other_index[indice_instance]
+            positions = self.random_positions(self.number_of_plants[global_index], global_index, seed)
 
-        self.other_positions[indice_instance] = positions
+        self.__store_positions(self.other_positions, indice_instance, positions)
+
+        if as_array:
+            return positions
+        return self.positions_list(positions)
 
-        return positions
-    
     def generate_random_wheat(
         self, adel_wheat, mtg, indice_wheat_instance=0, stem_name="stem", leaf_name="leaf", seed=None
     ):
@@ -399,30 +479,33 @@ class Planter:
         else:
             s = 1234
         random.seed(s)
-        numpy.random.seed(s)
 
         initial_scene = adel_wheat.scene(mtg)
 
         # tirage des positions
-        # list de 3-tuple des positions
-        if self.wheat_positions[indice_wheat_instance] != [] and self.save_wheat_positions:
+        if len(self.wheat_positions[indice_wheat_instance]) > 0 and self.save_wheat_positions:
             positions = self.wheat_positions[indice_wheat_instance]
         else:
-            positions = []
-            for i in range(self.number_of_plants[self.indexer.wheat_index[indice_wheat_instance]]):
-                positions.append(
-                    (numpy.random.uniform(0.0, self.domain[1][0]), numpy.random.uniform(0.0, self.domain[1][0]), 0.0)
-                )
+            global_index = self.indexer.wheat_index[indice_wheat_instance]
+            positions = self.random_positions(self.number_of_plants[global_index], global_index, seed)
 
-        self.wheat_positions[indice_wheat_instance] = positions
+        self.__store_positions(self.wheat_positions, indice_wheat_instance, positions)
 
         generated_scene = self.__generate_wheat_from_positions(
-            initial_scene, mtg, positions, var_leaf_inclination, var_leaf_azimut, var_stem_azimut, stem_name, leaf_name
+            initial_scene,
+            mtg,
+            self.positions_list(positions),
+            var_leaf_inclination,
+            var_leaf_azimut,
+            var_stem_azimut,
+            stem_name,
+            leaf_name,
+            indice_wheat_instance,
         )
 
         return generated_scene
 
-    def generate_row_other(self, indice_instance=0, seed=None):
+    def generate_row_other(self, indice_instance=0, seed=None, as_array=False):
         """Compute row plant positions for fspm other than l-egume and wheat
 
         Parameters
@@ -431,46 +514,25 @@ class Planter:
             specy ID corresponding to plants to generate, by default 0
         seed : int, optional
             random seed, by default None
+        as_array : bool, optional
+            returns positions as a numpy.array instead of a list of tuple, by default False
 
         Returns
         -------
-        list of tuple
-            list of plant positions (x, y, z)
+        list of tuple or numpy.array
+            list of plant positions (x, y, z), or array of dimensions (number of plants, 3)
         """        
-
-        if seed is not None:
-            s = seed
-        else:
-            s = 1234
-        random.seed(s)
-        numpy.random.seed(s)
-
-        if self.other_positions[indice_instance] != []:
+        if len(self.other_positions[indice_instance]) > 0:
             positions = self.other_positions[indice_instance]
         else:
-            positions = []
-
-            inter_plants = (
-                2 * self.domain[1][1] / self.number_of_plants[self.indexer.wheat_index[indice_instance]]
-            )
-            nrows = 2
-            self.total_n_rows
-
-            # first row on left 1/2 interrow, then 1 out of 2 row is wheat
-            rows_y = [self.inter_rows * 1.5, ((self.total_n_rows / nrows) + 1.5) * self.inter_rows]
-            for y in rows_y:
-                for ix in range(int(self.number_of_plants[self.indexer.wheat_index[indice_instance]] / nrows)):
-                    x = inter_plants * (0.5 + ix)
-                    p = (
-                        random.uniform(x - self.noise_plant_positions, x + self.noise_plant_positions),
-                        random.uniform(y - self.noise_plant_positions, y + self.noise_plant_positions),
-                        0.0,
-                    )
-                    positions.append(p)
+            global_index = self.indexer.other_index[indice_instance]
+            positions = self.row_positions(self.number_of_plants[global_index], global_index, seed)
 
-        self.other_positions[indice_instance] = positions
+        self.__store_positions(self.other_positions, indice_instance, positions)
 
-        return positions
+        if as_array:
+            return positions
+        return self.positions_list(positions)
 
     def generate_row_wheat(
         self, adel_wheat, mtg, indice_wheat_instance=0, stem_name="stem", leaf_name="leaf", seed=None
@@ -506,48 +568,317 @@ class Planter:
         else:
             s = 1234
         random.seed(s)
-        numpy.random.seed(s)
 
         initial_scene = adel_wheat.scene(mtg)
 
-        if self.wheat_positions[indice_wheat_instance] != [] and self.save_wheat_positions:
+        if len(self.wheat_positions[indice_wheat_instance]) > 0 and self.save_wheat_positions:
             positions = self.wheat_positions[indice_wheat_instance]
         else:
-            positions = []
+            global_index = self.indexer.wheat_index[indice_wheat_instance]
+            positions = self.row_positions(self.number_of_plants[global_index], global_index, seed)
 
-            inter_plants = (
-                2 * self.domain[1][1] / self.number_of_plants[self.indexer.wheat_index[indice_wheat_instance]]
-            )
-            nrows = 2
-            self.total_n_rows
-
-            # first row on left 1/2 interrow, then 1 out of 2 row is wheat
-            rows_y = [self.inter_rows * 1.5, ((self.total_n_rows / nrows) + 1.5) * self.inter_rows]
-            for y in rows_y:
-                for ix in range(int(self.number_of_plants[self.indexer.wheat_index[indice_wheat_instance]] / nrows)):
-                    x = inter_plants * (0.5 + ix)
-                    p = (
-                        random.uniform(x - self.noise_plant_positions, x + self.noise_plant_positions),
-                        random.uniform(y - self.noise_plant_positions, y + self.noise_plant_positions),
-                        0.0,
-                    )
-                    positions.append(p)
-
-        self.wheat_positions[indice_wheat_instance] = positions
+        self.__store_positions(self.wheat_positions, indice_wheat_instance, positions)
 
         generated_scene = self.__generate_wheat_from_positions(
             initial_scene,
             mtg,
-            positions,
+            self.positions_list(positions),
             var_leaf_inclination,
             var_leaf_azimut,
             var_stem_azimut,
             stem_name=stem_name,
             leaf_name=leaf_name,
+            indice_wheat_instance=indice_wheat_instance,
         )
 
         return generated_scene
 
+    def position_generator(self, global_index, seed=None):
+        """Random generator dedicated to the positions of one specy
+
+        The generator does not use nor change the global states of random and numpy.random
+
+        Parameters
+        ----------
+        global_index : int
+            specy ID in simulation (indexer.global_order)
+        seed : int, optional
+            random seed, by default None for 1234
+
+        Returns
+        -------
+        numpy.random.Generator
+            generator seeded by the seed and the specy ID
+        """        
+        if seed is None:
+            seed = 1234
+        return numpy.random.default_rng([seed, global_index])
+
+    def random_positions(self, number_of_plants, global_index=0, seed=None):
+        """Random plant positions in the squared soil domain
+
+        Parameters
+        ----------
+        number_of_plants : int
+            number of plants to generate
+        global_index : int, optional
+            specy ID in simulation, selects the random generator, by default 0
+        seed : int, optional
+            random seed, by default None
+
+        Returns
+        -------
+        numpy.array
+            plant positions (x, y, z), dimensions (number of plants, 3)
+        """        
+        generator = self.position_generator(global_index, seed)
+        positions = numpy.zeros((number_of_plants, 3))
+        positions[:, :2] = generator.uniform(0.0, self.domain[1][0], size=(number_of_plants, 2))
+        return positions
+
+    def row_positions(self, number_of_plants, global_index=0, seed=None):
+        """Plant positions on two rows, with a noise around each position
+
+        Note
+        ----
+        first row on left 1/2 interrow, then 1 out of 2 row is the specy
+
+        Parameters
+        ----------
+        number_of_plants : int
+            number of plants to generate
+        global_index : int, optional
+            specy ID in simulation, selects the random generator, by default 0
+        seed : int, optional
+            random seed, by default None
+
+        Returns
+        -------
+        numpy.array
+            plant positions (x, y, z), dimensions (number of plants, 3)
+        """        
+        nrows = 2
+        plants_per_row = int(number_of_plants / nrows)
+        inter_plants = 2 * self.domain[1][1] / number_of_plants
+        rows_y = numpy.array([self.inter_rows * 1.5, ((self.total_n_rows / nrows) + 1.5) * self.inter_rows])
+
+        positions = numpy.zeros((nrows * plants_per_row, 3))
+        positions[:, 0] = numpy.tile(inter_plants * (0.5 + numpy.arange(plants_per_row)), nrows)
+        positions[:, 1] = numpy.repeat(rows_y, plants_per_row)
+
+        generator = self.position_generator(global_index, seed)
+        positions[:, :2] += generator.uniform(
+            -self.noise_plant_positions, self.noise_plant_positions, size=(len(positions), 2)
+        )
+        return positions
+
+    def __store_positions(self, stored_positions, indice, positions):
+        """Stores the positions of a specy, the spatial index is computed again if they changed
+
+        Parameters
+        ----------
+        stored_positions : list
+            self.wheat_positions or self.other_positions
+        indice : int
+            specy ID among the wheat or other instances
+        positions : list or numpy.array
+            plant positions (x, y, z)
+        """        
+        if stored_positions[indice] is not positions:
+            stored_positions[indice] = positions
+            self.__spatial_index = None
+
+    def plants_spatial_index(self, cell_size=None):
+        """Uniform grid spatial index over the plant positions of all species managed by the planter
+
+        The index is computed once after the positions are generated, and computed again only if positions change.
+        Plant ids follow the order of the soil inputs, i.e. species in ``indexer.global_order`` with
+        ``number_of_plants`` plants each.
+
+        Parameters
+        ----------
+        cell_size : float, optional
+            side length of a grid cell in m, by default None for the mean distance between two plants
+
+        Returns
+        -------
+        SpatialIndex
+            spatial index of the plants
+        """        
+        if self.__spatial_index is not None and (cell_size is None or cell_size == self.__spatial_index.cell_size):
+            return self.__spatial_index
+
+        positions, plant_ids, species = [], [], []
+        stored_positions = [
+            (getattr(self, "wheat_positions", []), self.indexer.wheat_index),
+            (getattr(self, "other_positions", []), self.indexer.other_index),
+        ]
+        for specy_positions, specy_index in stored_positions:
+            for specy_p, global_index in zip(specy_positions, specy_index):
+                specy_p = numpy.asarray(specy_p, dtype=float).reshape(-1, 3)
+                first_id = sum(self.number_of_plants[:global_index])
+                positions.append(specy_p)
+                plant_ids.append(first_id + numpy.arange(len(specy_p)))
+                species.append(numpy.full(len(specy_p), global_index))
+
+        if positions:
+            positions = numpy.concatenate(positions)
+            plant_ids = numpy.concatenate(plant_ids)
+            species = numpy.concatenate(species)
+        else:
+            positions = numpy.zeros((0, 3))
+            plant_ids = numpy.zeros(0, dtype=int)
+            species = numpy.zeros(0, dtype=int)
+
+        if cell_size is None:
+            area = (self.domain[1][0] - self.domain[0][0]) * (self.domain[1][1] - self.domain[0][1])
+            cell_size = math.sqrt(area / max(len(positions), 1))
+
+        self.__spatial_index = SpatialIndex(positions, plant_ids, species, cell_size, self.domain[0])
+        return self.__spatial_index
+
+    def save_layout(self, filepath):
+        """Saves the plant layout in a .npz file
+
+        Note
+        ----
+        The file contains the generation type, the periodic tile arrangement, the domain, the number of plants, the 
+        plant positions per specy, the scenes translations, the l-egume arrangement parameters, the memo of 
+        AgronomicStand and the seed. Arrays are not compressed,
+        so they can be memory-mapped by ``load_layout``.
+
+        Parameters
+        ----------
+        filepath : str
+            path of the .npz file
+        """        
+        layout = {
+            "generation_type": numpy.array(self.generation_type),
+            "periodic": numpy.array(self.periodic),
+            "tile_arrangement": numpy.array("" if self.tile_arrangement is None else self.tile_arrangement),
+            "type_domain": numpy.array(getattr(self, "type_domain", "")),
+            "domain": numpy.array(self.domain, dtype=float),
+            "number_of_plants": numpy.array(self.number_of_plants, dtype=int),
+            "seed": numpy.array(-1 if self.seed is None else self.seed),
+        }
+        if self.field_domain is not None:
+            layout["field_domain"] = numpy.array(self.field_domain, dtype=float)
+
+        for name in ["wheat_positions", "other_positions"]:
+            for i, positions in enumerate(getattr(self, name, [])):
+                if len(positions) > 0:
+                    layout["{}_{}".format(name, i)] = numpy.asarray(positions, dtype=float).reshape(-1, 3)
+
+        # nan where a specy scene is not translated
+        if "translate" in self.transformations:
+            translate = numpy.full((len(self.indexer.global_order), 3), numpy.nan)
+            for i, vector in self.transformations["translate"].items():
+                translate[i] = vector
+            layout["translate"] = translate
+
+        for name in ["legume_nbcote", "legume_cote", "legume_typearrangement", "legume_optdamier"]:
+            if hasattr(self, name):
+                layout[name] = numpy.array(getattr(self, name))
+
+        if self.stands:
+            density, inter_rows, noise, seed = self.stand_parameters
+            layout["stand_parameters"] = numpy.array([density, inter_rows, noise, numpy.nan if seed is None else seed])
+            for nplants, (_, domain, positions, domain_area) in self.stands.items():
+                layout["stand_{}_domain".format(nplants)] = numpy.array(domain, dtype=float)
+                layout["stand_{}_positions".format(nplants)] = numpy.asarray(positions, dtype=float).reshape(-1, 3)
+                layout["stand_{}_area".format(nplants)] = numpy.array(domain_area, dtype=float)
+
+        numpy.savez(filepath, **layout)
+
+    def load_layout(self, filepath, mmap_mode="r"):
+        """Loads a plant layout saved by ``save_layout``, plant positions are not generated again
+
+        Note
+        ----
+        The planter must be created with the same indexer as the saved one. Wheat positions are kept between
+        timesteps, as with ``save_wheat_positions``.
+
+        Parameters
+        ----------
+        filepath : str
+            path of the .npz file
+        mmap_mode : str, optional
+            memory-map mode of the positions arrays, shared between processes reading the same file, 
+            by default "r", None for arrays loaded in memory
+        """        
+        layout = load_npz(filepath, mmap_mode=mmap_mode)
+
+        if len(layout["number_of_plants"]) != len(self.indexer.global_order):
+            raise ValueError("layout {} does not match the planter indexer".format(filepath))
+
+        self.generation_type = str(layout["generation_type"])
+        self.periodic = bool(layout["periodic"])
+        self.tile_arrangement = str(layout["tile_arrangement"]) if self.periodic else None
+        self.type_domain = str(layout["type_domain"])
+        self.domain = tuple(tuple(float(v) for v in xy) for xy in layout["domain"])
+        if "field_domain" in layout:
+            self.field_domain = tuple(tuple(float(v) for v in xy) for xy in layout["field_domain"])
+        else:
+            self.field_domain = self.domain
+        self.number_of_plants = [int(n) for n in layout["number_of_plants"]]
+        self.seed = None if int(layout["seed"]) < 0 else int(layout["seed"])
+
+        self.wheat_positions = [
+            layout.get("wheat_positions_{}".format(i), []) for i in range(len(self.indexer.wheat_names))
+        ]
+        self.other_positions = [
+            layout.get("other_positions_{}".format(i), []) for i in range(len(self.indexer.other_names))
+        ]
+        self.save_wheat_positions = True
+        self.__spatial_index = None
+
+        self.transformations.pop("translate", None)
+        if "translate" in layout:
+            translated = ~numpy.isnan(layout["translate"]).any(axis=1)
+            self.transformations["translate"] = {
+                int(i): tuple(float(v) for v in layout["translate"][i]) for i in numpy.flatnonzero(translated)
+            }
+
+        for name in ["legume_nbcote", "legume_cote", "legume_typearrangement", "legume_optdamier"]:
+            if name in layout:
+                setattr(self, name, layout[name].tolist())
+
+        self.invalidate_stands()
+        if "stand_parameters" in layout:
+            density, inter_rows, noise, seed = layout["stand_parameters"].tolist()
+            self.stand_parameters = (density, inter_rows, noise, None if math.isnan(seed) else int(seed))
+            for name in layout:
+                if name.startswith("stand_") and name.endswith("_positions"):
+                    nplants = int(name.split("_")[1])
+                    self.stands[nplants] = (
+                        nplants,
+                        tuple(tuple(float(v) for v in xy) for xy in layout["stand_{}_domain".format(nplants)]),
+                        self.positions_list(layout[name]),
+                        float(layout["stand_{}_area".format(nplants)]),
+                    )
+
+        self.tile_replications = (
+            (self.field_domain[1][0] - self.field_domain[0][0]) * (self.field_domain[1][1] - self.field_domain[0][1])
+        ) / ((self.domain[1][0] - self.domain[0][0]) * (self.domain[1][1] - self.domain[0][1]))
+
+    @staticmethod
+    def positions_list(positions):
+        """List view of plant positions
+
+        Parameters
+        ----------
+        positions : numpy.array or list
+            plant positions (x, y, z)
+
+        Returns
+        -------
+        list of tuple
+            list of plant positions (x, y, z)
+        """        
+        if isinstance(positions, numpy.ndarray):
+            return [tuple(p) for p in positions.tolist()]
+        return positions
+
     def create_heterogeneous_canopy(
         self,
         geometrical_model,
@@ -589,25 +920,12 @@ class Planter:
             list of plant positions (x, y, z)
         """        
 
-        from alinea.adel.Stand import AgronomicStand
-        
-        if seed is not None:
-            random.seed(seed)
-            numpy.random.seed(seed)
-
         # Planter
-        stand = AgronomicStand(
-            sowing_density=self.plant_density[1],
-            plant_density=self.plant_density[1],
-            inter_row=self.inter_rows,
-            noise=self.noise_plant_positions,
-        )
-        _, domain, positions, _ = stand.smart_stand(
+        _, domain, positions, _ = self.agronomic_stand(
             nplants=self.number_of_plants[self.indexer.wheat_index[indice_wheat_instance]],
-            at=self.inter_rows,
-            convunit=1,
+            seed=seed,
         )
-        self.wheat_positions[indice_wheat_instance] = positions
+        self.__store_positions(self.wheat_positions, indice_wheat_instance, positions)
 
         random.seed(1234)
 
@@ -620,6 +938,7 @@ class Planter:
             var_stem_azimut,
             stem_name=stem_name,
             leaf_name=leaf_name,
+            indice_wheat_instance=indice_wheat_instance,
         )
 
         if self.type_domain == "create_heterogeneous_canopy":
@@ -627,6 +946,54 @@ class Planter:
 
         return generated_scene
 
+    def agronomic_stand(self, nplants, seed=None):
+        """Positions and soil domain of an AgronomicStand, memoized along the simulation
+
+        Note
+        ----
+        The memo is keyed on plant density, inter rows, noise, number of plants and seed. It is emptied when
+        plant density, inter rows, noise or seed differs from the previous call, see also ``invalidate_stands``.
+
+        Parameters
+        ----------
+        nplants : int
+            number of plants in the stand
+        seed : int, optional
+            seed for random and numpy, by default None
+
+        Returns
+        -------
+        4-tuple
+            outputs of AgronomicStand.smart_stand: number of plants, domain, positions and domain area
+        """        
+        stand_parameters = (self.plant_density[1], self.inter_rows, self.noise_plant_positions, seed)
+        if stand_parameters != self.stand_parameters:
+            self.invalidate_stands()
+            self.stand_parameters = stand_parameters
+
+        if nplants not in self.stands:
+            from alinea.adel.Stand import AgronomicStand
+
+            if seed is not None:
+                random.seed(seed)
+                numpy.random.seed(seed)
+
+            stand = AgronomicStand(
+                sowing_density=self.plant_density[1],
+                plant_density=self.plant_density[1],
+                inter_row=self.inter_rows,
+                noise=self.noise_plant_positions,
+            )
+            self.stands[nplants] = stand.smart_stand(nplants=nplants, at=self.inter_rows, convunit=1)
+
+        return self.stands[nplants]
+
+    def invalidate_stands(self):
+        """Empties the AgronomicStand memo, next canopy will compute new positions and domain
+        """        
+        self.stands = {}
+        self.stand_parameters = None
+
     def __generate_wheat_from_positions(
         self,
         geometrical_model,
@@ -637,9 +1004,21 @@ class Planter:
         var_stem_azimut=0.157,
         stem_name="stem",
         leaf_name="leaf",
+        indice_wheat_instance=0,
     ):
         """Generate complete wheats from their plant positions
 
+        Note
+        ----
+        If ``cache_canopy`` is activated, the previous canopy of the wheat instance is returned when the wheat geometry,
+        the positions, the variabilities and the random state of stem azimuts are the same as the previous call
+
+        If ``incremental_canopy`` is activated, only the shapes whose geometry changed are instantiated again
+
+        If ``canopy_output`` is "triangles", the canopy is returned as a dict of flat arrays, see ``triangles_from_matrices``
+
+        If ``lod_core_fraction`` is set, plants outside the core region are duplicated from simplified shapes, see ``core_plants``
+
         Parameters
         ----------
         geometrical_model : AdelWheat
@@ -658,10 +1037,12 @@ class Planter:
             stem tag in the plantgl.Scene, by default "stem"
         leaf_name : str, optional
             leaf tag in the plantgl.Scene, by default "leaf"
+        indice_wheat_instance : int, optional
+            wheat specy ID in simulation, by default 0
 
         Returns
         -------
-        plantgl.Scene
+        plantgl.Scene or dict
             final scene of the generated wheats 
         """        
         # Load scene
@@ -670,76 +1051,839 @@ class Planter:
         else:
             initial_scene = geometrical_model
 
-        alea_canopy = pandas.DataFrame()
-
-        # Built alea table if does not exist yet
-        if alea_canopy.empty and mtg is not None:
-            elements_vid_list = []
-            for mtg_plant_vid in mtg.components_iter(mtg.root):
-                for mtg_axis_vid in mtg.components_iter(mtg_plant_vid):
-                    for mtg_metamer_vid in mtg.components_iter(mtg_axis_vid):
-                        for mtg_organ_vid in mtg.components_iter(mtg_metamer_vid):
-                            for mtg_element_vid in mtg.components_iter(mtg_organ_vid):
-                                if mtg.label(mtg_element_vid) == leaf_name:
-                                    elements_vid_list.append(mtg_element_vid)
-
-            elements_vid_df = pandas.DataFrame({"vid": elements_vid_list, "tmp": 1})
-            positions_df = pandas.DataFrame(
-                {"pos": range(len(positions)), "tmp": 1, "azimut_leaf": 0, "inclination_leaf": 0}
+        if self.cache_canopy:
+            canopy_key = (
+                self.scene_fingerprint(initial_scene),
+                tuple(tuple(pos) for pos in positions),
+                var_leaf_inclination,
+                var_leaf_azimut,
+                var_stem_azimut,
+                stem_name,
+                leaf_name,
+                random.getstate(),
             )
-            alea = pandas.merge(elements_vid_df, positions_df, on=["tmp"])
-            alea = alea.drop("tmp", axis=1)
-            for vid in elements_vid_list:
-                numpy.random.seed(vid)
-                alea.loc[alea["vid"] == vid, "azimut_leaf"] = numpy.random.uniform(
-                    -var_leaf_azimut, var_leaf_azimut, size=len(positions)
-                )
-                alea.loc[alea["vid"] == vid, "inclination_leaf"] = numpy.random.uniform(
-                    -var_leaf_inclination, var_leaf_inclination, size=len(positions)
-                )
-            alea_canopy = alea
+            if indice_wheat_instance in self.canopy_cache:
+                previous_key, previous_scene = self.canopy_cache[indice_wheat_instance]
+                if previous_key == canopy_key:
+                    # stem azimuts are drawn anyway, random is left in the same state as after a full generation
+                    for pos in positions:
+                        random.uniform(-var_stem_azimut, var_stem_azimut)
+                    return previous_scene
+
+        # labels are read once per shape instead of once per shape and per plant
+        shapes_labels = [(shp, mtg.label(shp.id)) for shp in initial_scene]
+        shapes_labels = [(shp, label) for shp, label in shapes_labels if label in (stem_name, leaf_name)]
+        leaves = [shp for shp, label in shapes_labels if label == leaf_name]
+
+        # leaf variability, one column per leaf vid
+        perturbations = self.leaf_perturbations(len(positions), var_leaf_azimut, var_leaf_inclination)
+        slots = perturbations.slots([shp.id for shp in leaves])
+
+        # stem variability, one draw per plant in positions order
+        azimut_stems = [random.uniform(-var_stem_azimut, var_stem_azimut) for pos in positions]
+
+        # rotation angles for each (plant, shape) and anchor point of each shape, stems rotate around their base
+        stems_mask = numpy.array([label == stem_name for shp, label in shapes_labels], dtype=bool)
+        shapes_azimuts = numpy.zeros((len(positions), len(shapes_labels)))
+        shapes_inclinations = numpy.zeros((len(positions), len(shapes_labels)))
+        shapes_anchors = numpy.zeros((len(shapes_labels), 3))
+        shapes_azimuts[:, stems_mask] = numpy.array(azimut_stems).reshape(-1, 1)
+        shapes_azimuts[:, ~stems_mask] = perturbations.azimut[:, slots]
+        shapes_inclinations[:, ~stems_mask] = perturbations.inclination[:, slots]
+        if len(leaves) > 0:
+            shapes_anchors[~stems_mask] = [tuple(mtg.get_vertex_property(shp.id)["anchor_point"]) for shp in leaves]
+
+        # level of detail, plants outside the core are duplicated from simplified shapes
+        core = self.core_plants(positions)
+        if core.all():
+            sources = [(shp, shp) for shp, label in shapes_labels]
+        else:
+            sources = [(shp, self.simplified_shape(shp)) for shp, label in shapes_labels]
 
         # Duplication and heterogeneity
-        duplicated_scene = plantgl.Scene()
-        position_number = 0
-        for pos in positions:
-            azimut_stem = random.uniform(-var_stem_azimut, var_stem_azimut)
-            for shp in initial_scene:
-                if mtg.label(shp.id) == stem_name:
-                    rotated_geometry = plantgl.EulerRotated(azimut_stem, 0, 0, shp.geometry)
-                    translated_geometry = plantgl.Translated(plantgl.Vector3(pos), rotated_geometry)
-                    new_shape = plantgl.Shape(translated_geometry, appearance=shp.appearance, id=shp.id)
-                    duplicated_scene += new_shape
-                elif mtg.label(shp.id) == leaf_name:
-                    # Add shp.id in alea_canopy if not in yet:
-                    if shp.id not in list(alea_canopy["vid"]):
-                        new_vid_df = pandas.DataFrame({"vid": shp.id, "pos": range(len(positions))})
-                        numpy.random.seed(shp.id)
-                        new_vid_df["azimut_leaf"] = numpy.random.uniform(
-                            -var_leaf_azimut, var_leaf_azimut, size=len(positions)
-                        )
-                        new_vid_df["inclination_leaf"] = numpy.random.uniform(
-                            -var_leaf_inclination, var_leaf_inclination, size=len(positions)
-                        )
-                        alea_canopy = alea_canopy.copy().append(new_vid_df, sort=False)
-                    # Translation to origin
-                    anchor_point = mtg.get_vertex_property(shp.id)["anchor_point"]
-                    trans_to_origin = plantgl.Translated(-anchor_point, shp.geometry)
-                    # Rotation variability
-                    azimut = alea_canopy.loc[
-                        (alea_canopy.pos == position_number) & (alea_canopy.vid == shp.id), "azimut_leaf"
-                    ].values[0]
-                    inclination = alea_canopy.loc[
-                        (alea_canopy.pos == position_number) & (alea_canopy.vid == shp.id), "inclination_leaf"
-                    ].values[0]
-                    rotated_geometry = plantgl.EulerRotated(azimut, inclination, 0, trans_to_origin)
-                    # Restore leaf base at initial anchor point
-                    translated_geometry = plantgl.Translated(anchor_point, rotated_geometry)
-                    # Translate leaf to new plant position
-                    translated_geometry = plantgl.Translated(pos, translated_geometry)
-                    new_shape = plantgl.Shape(translated_geometry, appearance=shp.appearance, id=shp.id)
-                    duplicated_scene += new_shape
-
-            position_number += 1
+        if self.canopy_output == "triangles" or self.transform_engine == "matrix":
+            matrices = self.canopy_matrices(positions, shapes_azimuts, shapes_inclinations, shapes_anchors)
+        else:
+            matrices = None
+
+        if self.canopy_output == "triangles":
+            specy_id = self.indexer.wheat_index[indice_wheat_instance]
+            duplicated_scene = self.triangles_from_matrices(
+                [full for full, simplified in sources], matrices[core], specy_id, plants=numpy.flatnonzero(core)
+            )
+            if not core.all():
+                simplified_canopy = self.triangles_from_matrices(
+                    [simplified for full, simplified in sources],
+                    matrices[~core],
+                    specy_id,
+                    plants=numpy.flatnonzero(~core),
+                )
+                duplicated_scene = {
+                    key: numpy.concatenate((duplicated_scene[key], simplified_canopy[key])) for key in duplicated_scene
+                }
+
+        else:
+            if self.incremental_canopy:
+                previous = self.canopy_instances.get(indice_wheat_instance)
+                layout = (
+                    tuple(tuple(pos) for pos in positions),
+                    var_leaf_inclination,
+                    var_leaf_azimut,
+                    stem_name,
+                    leaf_name,
+                    self.transform_engine,
+                )
+                if previous is None or previous["layout"] != layout:
+                    previous = {"layout": layout, "order": None, "instances": {}, "scene": None}
+            else:
+                previous = {"layout": None, "order": None, "instances": {}, "scene": None}
+
+            # duplicated shapes are stored as {shape id : (state, [shape for each position])}
+            instances = {}
+            changed_ids = []
+            for i_shape, (shp, label) in enumerate(shapes_labels):
+                if self.incremental_canopy:
+                    state = (
+                        self.shape_fingerprint(shp),
+                        tuple(shapes_anchors[i_shape]),
+                        tuple(shapes_azimuts[:, i_shape]),
+                        tuple(shapes_inclinations[:, i_shape]),
+                    )
+                else:
+                    state = None
+
+                if shp.id in previous["instances"] and previous["instances"][shp.id][0] == state:
+                    instances[shp.id] = previous["instances"][shp.id]
+                else:
+                    full_shp, simplified_shp = sources[i_shape]
+                    if self.transform_engine == "matrix":
+                        shapes = [None] * len(positions)
+                        for mask, source in ((core, full_shp), (~core, simplified_shp)):
+                            if not mask.any():
+                                continue
+                            for p, new_shape in zip(
+                                numpy.flatnonzero(mask), self.__matrix_instances(source, matrices[mask, i_shape])
+                            ):
+                                shapes[p] = new_shape
+                    elif stems_mask[i_shape]:
+                        shapes = [
+                            self.__stem_instance(
+                                full_shp if core[p] else simplified_shp, pos, shapes_azimuts[p, i_shape]
+                            )
+                            for p, pos in enumerate(positions)
+                        ]
+                    else:
+                        anchor_point = mtg.get_vertex_property(shp.id)["anchor_point"]
+                        shapes = [
+                            self.__leaf_instance(
+                                full_shp if core[p] else simplified_shp,
+                                pos,
+                                anchor_point,
+                                shapes_azimuts[p, i_shape],
+                                shapes_inclinations[p, i_shape],
+                            )
+                            for p, pos in enumerate(positions)
+                        ]
+                    instances[shp.id] = (state, shapes)
+                    changed_ids.append(shp.id)
+
+            order = [shp.id for shp, label in shapes_labels]
+            if previous["order"] == order:
+                # splices the new instances in the previous scene, ordered by position then by shape
+                duplicated_scene = previous["scene"]
+                index_in_plant = {vid: i for i, vid in enumerate(order)}
+                for vid in changed_ids:
+                    for position_number, new_shape in enumerate(instances[vid][1]):
+                        duplicated_scene[position_number * len(order) + index_in_plant[vid]] = new_shape
+            else:
+                duplicated_scene = plantgl.Scene()
+                for position_number in range(len(positions)):
+                    for vid in order:
+                        duplicated_scene += instances[vid][1][position_number]
+
+            if self.incremental_canopy:
+                self.canopy_instances[indice_wheat_instance] = {
+                    "layout": previous["layout"],
+                    "order": order,
+                    "instances": instances,
+                    "scene": duplicated_scene,
+                }
+
+        if self.cache_canopy:
+            self.canopy_cache[indice_wheat_instance] = (canopy_key, duplicated_scene)
 
         return duplicated_scene
+
+    @staticmethod
+    def canopy_matrices(positions, azimuts, inclinations, anchors):
+        """Affine transformation of each (plant, shape) in one 4x4 matrix
+
+        The matrix composes the four plantgl transformations of a duplicated leaf: translation of the anchor point
+        to the origin, rotation of azimut and inclination, translation back to the anchor point and translation to
+        the plant position. All matrices are computed at once.
+
+        Parameters
+        ----------
+        positions : list
+            list of plant positions as (x, y, z) in m
+        azimuts : numpy.array
+            azimut rotation of each shape (rad), dimensions (number of positions, number of shapes)
+        inclinations : numpy.array
+            inclination rotation of each shape (rad), dimensions (number of positions, number of shapes)
+        anchors : numpy.array
+            rotation center of each shape, dimensions (number of shapes, 3)
+
+        Returns
+        -------
+        numpy.array
+            affine matrices, dimensions (number of positions, number of shapes, 4, 4)
+        """        
+        positions = numpy.array(positions, dtype=float).reshape(-1, 3)
+        anchors = numpy.asarray(anchors, dtype=float)
+        rotations = euler_rotation_matrices(azimuts, inclinations)
+
+        matrices = numpy.zeros(rotations.shape[:2] + (4, 4))
+        matrices[..., :3, :3] = rotations
+        matrices[..., :3, 3] = (
+            positions[:, numpy.newaxis, :]
+            + anchors[numpy.newaxis]
+            - numpy.einsum("psij,sj->psi", rotations, anchors)
+        )
+        matrices[..., 3, 3] = 1.0
+        return matrices
+
+    def core_plants(self, positions):
+        """Plants keeping their full geometry with the level of detail option
+
+        Note
+        ----
+        The core region is a square centered on the soil domain, its side is ``lod_core_fraction`` times the domain side
+
+        Parameters
+        ----------
+        positions : list
+            list of plant positions as (x, y, z) in m
+
+        Returns
+        -------
+        numpy.array
+            boolean mask, True for plants in the core region
+        """        
+        positions = numpy.array(positions, dtype=float).reshape(-1, 3)
+        if self.lod_core_fraction is None:
+            return numpy.ones(len(positions), dtype=bool)
+
+        domain = numpy.array(self.domain, dtype=float)
+        center = domain.mean(axis=0)
+        half_sides = 0.5 * self.lod_core_fraction * (domain[1] - domain[0])
+        return numpy.all(numpy.abs(positions[:, :2] - center) <= half_sides, axis=1)
+
+    def simplified_shape(self, shp):
+        """Simplified copy of a shape, computed again only if the shape geometry changed
+
+        Parameters
+        ----------
+        shp : plantgl.Shape
+            shape in the source scene
+
+        Returns
+        -------
+        plantgl.Shape
+            shape with ``lod_keep_ratio`` of its triangles, with the same id, appearance and area
+        """        
+        fingerprint = self.shape_fingerprint(shp)
+        if shp.id in self.simplified_shapes and self.simplified_shapes[shp.id][0] == fingerprint:
+            return self.simplified_shapes[shp.id][1]
+
+        triangles = decimate_triangles(shape_triangles(shp), self.lod_keep_ratio)
+        simplified = plantgl.Shape(
+            plantgl.TriangleSet(
+                plantgl.Point3Array(triangles.reshape(-1, 3).tolist()),
+                plantgl.Index3Array([(3 * i, 3 * i + 1, 3 * i + 2) for i in range(len(triangles))]),
+            ),
+            appearance=shp.appearance,
+            id=shp.id,
+        )
+        self.simplified_shapes[shp.id] = (fingerprint, simplified)
+        return simplified
+
+    @staticmethod
+    def triangles_from_matrices(shapes, matrices, specy_id=0, plants=None):
+        """Duplicates the triangles of one plant on all plant positions in flat numpy arrays
+
+        Triangles of the template plant are transformed with the affine matrices of ``canopy_matrices``,
+        which gives the same geometry as the plantgl canopy without creating one plantgl object per shape and per plant.
+        Triangles are ordered by plant then by shape, like the shapes of the plantgl canopy.
+
+        Parameters
+        ----------
+        shapes : list of plantgl.Shape
+            stems and leaves of the template plant
+        matrices : numpy.array
+            affine matrices, dimensions (number of positions, number of shapes, 4, 4)
+        specy_id : int, optional
+            specy ID in simulation, by default 0
+        plants : numpy.array, optional
+            plant number of each row of matrices, by default None for 0, 1, ..., number of positions - 1
+
+        Returns
+        -------
+        dict
+            ``{"triangles": (n_triangles, 3, 3) array of vertices, "species": specy id per triangle, "organs": organ id per triangle, "plants": plant number per triangle}``
+        """        
+        n_positions = matrices.shape[0]
+        if plants is None:
+            plants = numpy.arange(n_positions)
+
+        # triangles of the template plant, each triangle knows its shape
+        template_triangles = [shape_triangles(shp) for shp in shapes]
+        triangles_per_shape = [len(t) for t in template_triangles]
+        shape_of_triangle = numpy.repeat(numpy.arange(len(shapes)), triangles_per_shape)
+        if template_triangles:
+            triangles = numpy.concatenate(template_triangles)
+        else:
+            triangles = numpy.zeros((0, 3, 3))
+
+        # each shape is transformed in place in the output, without a matrix per triangle
+        duplicated = numpy.empty((n_positions, len(triangles), 3, 3))
+        ends = numpy.cumsum(triangles_per_shape, dtype=int)
+        for shape_index, (start, end) in enumerate(zip(ends - triangles_per_shape, ends)):
+            shape_block = duplicated[:, start:end]
+            numpy.einsum("pij,tkj->ptki", matrices[:, shape_index, :3, :3], triangles[start:end], out=shape_block)
+            shape_block += matrices[:, shape_index, numpy.newaxis, numpy.newaxis, :3, 3]
+
+        organs_id = numpy.array([shp.id for shp in shapes], dtype=int)
+        return {
+            "triangles": numpy.ascontiguousarray(duplicated.reshape(-1, 3, 3)),
+            "species": numpy.full(n_positions * len(triangles), specy_id, dtype=int),
+            "organs": numpy.tile(organs_id[shape_of_triangle], n_positions),
+            "plants": numpy.repeat(numpy.asarray(plants, dtype=int), len(triangles)),
+        }
+
+    def __matrix_instances(self, shp, matrices):
+        """Duplicates a shape at each plant position by transforming its vertices
+
+        Each duplicated shape is a new plantgl.TriangleSet sharing the indices of the template shape,
+        instead of a chain of plantgl transformations.
+
+        Parameters
+        ----------
+        shp : plantgl.Shape
+            shape in the source scene
+        matrices : numpy.array
+            affine matrices of the shape, dimensions (number of positions, 4, 4)
+
+        Returns
+        -------
+        list of plantgl.Shape
+            duplicated shape for each plant position
+        """        
+        points, indices = shape_mesh(shp)
+        duplicated_points = numpy.einsum("pij,kj->pki", matrices[:, :3, :3], points)
+        duplicated_points += matrices[:, numpy.newaxis, :3, 3]
+        return [
+            plantgl.Shape(
+                plantgl.TriangleSet(plantgl.Point3Array(p.tolist()), indices), appearance=shp.appearance, id=shp.id
+            )
+            for p in duplicated_points
+        ]
+
+    def __stem_instance(self, shp, pos, azimut_stem):
+        """Duplicates a stem shape at a plant position
+
+        Parameters
+        ----------
+        shp : plantgl.Shape
+            stem shape in the source scene
+        pos : tuple
+            plant position (x, y, z) in m
+        azimut_stem : float
+            stem azimut of the plant (rad)
+
+        Returns
+        -------
+        plantgl.Shape
+            duplicated stem
+        """        
+        rotated_geometry = plantgl.EulerRotated(azimut_stem, 0, 0, shp.geometry)
+        translated_geometry = plantgl.Translated(plantgl.Vector3(pos), rotated_geometry)
+        return plantgl.Shape(translated_geometry, appearance=shp.appearance, id=shp.id)
+
+    def __leaf_instance(self, shp, pos, anchor_point, azimut, inclination):
+        """Duplicates a leaf shape at a plant position with a rotation around its anchor point
+
+        Parameters
+        ----------
+        shp : plantgl.Shape
+            leaf shape in the source scene
+        pos : tuple
+            plant position (x, y, z) in m
+        anchor_point : Vector3
+            leaf base on the stem
+        azimut : float
+            leaf azimut perturbation (rad)
+        inclination : float
+            leaf inclination perturbation (rad)
+
+        Returns
+        -------
+        plantgl.Shape
+            duplicated leaf
+        """        
+        # Translation to origin
+        trans_to_origin = plantgl.Translated(-anchor_point, shp.geometry)
+        # Rotation variability
+        rotated_geometry = plantgl.EulerRotated(azimut, inclination, 0, trans_to_origin)
+        # Restore leaf base at initial anchor point
+        translated_geometry = plantgl.Translated(anchor_point, rotated_geometry)
+        # Translate leaf to new plant position
+        translated_geometry = plantgl.Translated(pos, translated_geometry)
+        return plantgl.Shape(translated_geometry, appearance=shp.appearance, id=shp.id)
+
+    @staticmethod
+    def shape_fingerprint(shp):
+        """Cheap fingerprint of a plantgl shape geometry
+
+        The shape is summarized by its id and its bounding box, and by its number of points and its points 
+        center for geometries with a list of points, all computed by plantgl.
+
+        Parameters
+        ----------
+        shp : plantgl.Shape
+            shape to summarize
+
+        Returns
+        -------
+        tuple
+            fingerprint of the shape, two shapes with the same geometry have equal fingerprints
+        """        
+        geometry = shp.geometry
+        bbox = plantgl.BoundingBox(geometry)
+        fingerprint = (shp.id, tuple(bbox.lowerLeftCorner), tuple(bbox.upperRightCorner))
+        points = getattr(geometry, "pointList", None)
+        if points is not None and len(points) > 0:
+            fingerprint += (len(points), tuple(points.getCenter()))
+        return fingerprint
+
+    @classmethod
+    def scene_fingerprint(cls, scene):
+        """Cheap fingerprint of a plantgl scene geometry, see ``shape_fingerprint``
+
+        Parameters
+        ----------
+        scene : plantgl.Scene
+            scene to summarize
+
+        Returns
+        -------
+        tuple
+            fingerprint of the scene, two scenes with the same geometry have equal fingerprints
+        """        
+        return tuple(cls.shape_fingerprint(shp) for shp in scene)
+
+    def leaf_perturbations(self, number_of_positions, var_leaf_azimut=1.57, var_leaf_inclination=0.157):
+        """Return the leaf perturbation table for a number of plants and variability amplitudes
+
+        Tables are kept between timesteps, so leaves keep the same perturbation along the simulation.
+
+        Parameters
+        ----------
+        number_of_positions : int
+            number of duplicated plants
+        var_leaf_azimut : float, optional
+            variability for leaf azimut (rad), by default 1.57
+        var_leaf_inclination : float, optional
+            variability for leaf inclination (rad), by default 0.157
+
+        Returns
+        -------
+        LeafPerturbations
+            perturbation table of the duplicated leaves
+        """        
+        key = (number_of_positions, var_leaf_azimut, var_leaf_inclination)
+        if key not in self.leaf_perturbations_tables:
+            self.leaf_perturbations_tables[key] = LeafPerturbations(*key)
+        return self.leaf_perturbations_tables[key]
+
+
+def euler_rotation_matrices(azimut, elevation, roll=None):
+    """Rotation matrices equivalent to plantgl.EulerRotated, computed for arrays of angles
+
+    The rotation is Rz(azimut) . Ry(elevation) . Rx(roll).
+
+    Parameters
+    ----------
+    azimut : numpy.array
+        rotation angles around z axis (rad)
+    elevation : numpy.array
+        rotation angles around y axis (rad)
+    roll : numpy.array, optional
+        rotation angles around x axis (rad), by default None for no rotation
+
+    Returns
+    -------
+    numpy.array
+        rotation matrices, dimensions (number of angles, 3, 3)
+    """    
+    azimut = numpy.asarray(azimut, dtype=float)
+    elevation = numpy.asarray(elevation, dtype=float)
+    if roll is None:
+        roll = numpy.zeros(azimut.shape)
+    ca, sa = numpy.cos(azimut), numpy.sin(azimut)
+    ce, se = numpy.cos(elevation), numpy.sin(elevation)
+    cr, sr = numpy.cos(roll), numpy.sin(roll)
+
+    rotations = numpy.empty(azimut.shape + (3, 3))
+    rotations[..., 0, 0] = ca * ce
+    rotations[..., 0, 1] = ca * se * sr - sa * cr
+    rotations[..., 0, 2] = ca * se * cr + sa * sr
+    rotations[..., 1, 0] = sa * ce
+    rotations[..., 1, 1] = sa * se * sr + ca * cr
+    rotations[..., 1, 2] = sa * se * cr - ca * sr
+    rotations[..., 2, 0] = -se
+    rotations[..., 2, 1] = ce * sr
+    rotations[..., 2, 2] = ce * cr
+    return rotations
+
+
+def shape_mesh(shp):
+    """Vertices of a plantgl shape as a numpy array and its triangles indices
+
+    Parameters
+    ----------
+    shp : plantgl.Shape
+        shape to tesselate
+
+    Returns
+    -------
+    numpy.array, plantgl.Index3Array
+        vertices, dimensions (number of points, 3), and triangles indices
+    """    
+    tesselator = plantgl.Tesselator()
+    shp.geometry.apply(tesselator)
+    mesh = tesselator.result
+    if mesh is None or len(mesh.indexList) == 0:
+        return numpy.zeros((0, 3)), plantgl.Index3Array()
+    points = numpy.array([tuple(p) for p in mesh.pointList], dtype=float)
+    return points, mesh.indexList
+
+
+def shape_triangles(shp):
+    """Triangles of a plantgl shape as a numpy array
+
+    Parameters
+    ----------
+    shp : plantgl.Shape
+        shape to tesselate
+
+    Returns
+    -------
+    numpy.array
+        vertices of each triangle, dimensions (number of triangles, 3, 3)
+    """    
+    points, indices = shape_mesh(shp)
+    if len(indices) == 0:
+        return numpy.zeros((0, 3, 3))
+    return points[numpy.array([tuple(i) for i in indices], dtype=int)]
+
+
+def decimate_triangles(triangles, keep_ratio):
+    """Simplifies a mesh by keeping one triangle out of each group of consecutive triangles
+
+    Consecutive triangles of leaf and stem meshes are neighbours. In each group, the triangle with the largest area
+    projected on the mean orientation of the group is kept, moved to the area weighted centroid of the group and 
+    scaled to the area of the whole group, so the mesh area and its centroid are kept and the orientation of the 
+    group is close to the orientation of its triangles.
+
+    Parameters
+    ----------
+    triangles : numpy.array
+        vertices of each triangle, dimensions (number of triangles, 3, 3)
+    keep_ratio : float
+        maximum fraction of triangles to keep, between 0 and 1
+
+    Returns
+    -------
+    numpy.array
+        vertices of each kept triangle, dimensions (number of kept triangles, 3, 3)
+    """    
+    triangles = numpy.asarray(triangles, dtype=float).reshape(-1, 3, 3)
+    # groups are large enough to keep at most keep_ratio of the triangles
+    group_size = max(1, int(numpy.ceil(1.0 / keep_ratio - 1e-9)))
+    if group_size == 1 or len(triangles) == 0:
+        return triangles.copy()
+
+    # area vectors, normal to each triangle with the triangle area as norm
+    area_vectors = 0.5 * numpy.cross(triangles[:, 1] - triangles[:, 0], triangles[:, 2] - triangles[:, 0])
+    areas = numpy.linalg.norm(area_vectors, axis=1)
+
+    # groups of consecutive triangles, the last group is padded with empty triangles
+    n_groups = -(-len(triangles) // group_size)
+    padded_areas = numpy.zeros(n_groups * group_size)
+    padded_areas[: len(areas)] = areas
+    padded_areas = padded_areas.reshape(n_groups, group_size)
+    padded_vectors = numpy.zeros((n_groups * group_size, 3))
+    padded_vectors[: len(areas)] = area_vectors
+    padded_vectors = padded_vectors.reshape(n_groups, group_size, 3)
+
+    group_orientations = padded_vectors.sum(axis=1)
+    projected_areas = numpy.abs(numpy.einsum("gti,gi->gt", padded_vectors, group_orientations))
+    kept = numpy.arange(n_groups) * group_size + numpy.argmax(projected_areas + 1e-12 * padded_areas, axis=1)
+    kept_areas = areas[kept]
+    group_areas = padded_areas.sum(axis=1)
+    scales = numpy.sqrt(numpy.divide(group_areas, kept_areas, out=numpy.ones(n_groups), where=kept_areas > 0))
+
+    # area weighted centroid of each group, the kept triangle centroid for groups without area
+    padded_centroids = numpy.zeros((n_groups * group_size, 3))
+    padded_centroids[: len(areas)] = triangles.mean(axis=1)
+    padded_centroids = padded_centroids.reshape(n_groups, group_size, 3)
+    kept_centroids = triangles[kept].mean(axis=1)
+    group_centroids = numpy.divide(
+        numpy.einsum("gt,gti->gi", padded_areas, padded_centroids),
+        group_areas[:, numpy.newaxis],
+        out=kept_centroids.copy(),
+        where=group_areas[:, numpy.newaxis] > 0,
+    )
+
+    scaled = scales[:, numpy.newaxis, numpy.newaxis] * (triangles[kept] - kept_centroids[:, numpy.newaxis])
+    return group_centroids[:, numpy.newaxis] + scaled
+
+
+class SpatialIndex:
+    """Uniform grid spatial index of plant positions
+
+    Each plant is assigned to a square cell of the grid, the index stores plant id -> cell and cell -> plant ids
+
+    Parameters
+    ----------
+    positions : numpy.array
+        plant positions (x, y, z) in m, dimensions (number of plants, 3)
+    plant_ids : numpy.array
+        global id of each plant
+    species : numpy.array
+        specy ID in simulation of each plant
+    cell_size : float
+        side length of a grid cell in m
+    origin : tuple, optional
+        (x, y) origin of the grid, by default (0.0, 0.0)
+
+    """    
+    def __init__(self, positions, plant_ids, species, cell_size, origin=(0.0, 0.0)) -> None:
+        """Constructor, assigns each plant to a cell
+
+        """        
+        self.positions = numpy.asarray(positions, dtype=float).reshape(-1, 3)
+        self.plant_ids = numpy.asarray(plant_ids, dtype=int)
+        self.species = numpy.asarray(species, dtype=int)
+        self.cell_size = cell_size
+        self.origin = numpy.asarray(origin[:2], dtype=float)
+
+        self.cells = numpy.floor((self.positions[:, :2] - self.origin) / cell_size).astype(int)
+        self.plant_rows: dict = {plant_id: row for row, plant_id in enumerate(self.plant_ids.tolist())}
+
+        self.cell_to_plants: dict = {}
+        if len(self.cells) > 0:
+            unique_cells, inverse = numpy.unique(self.cells, axis=0, return_inverse=True)
+            inverse = inverse.reshape(-1)
+            order = numpy.argsort(inverse, kind="stable")
+            splits = numpy.cumsum(numpy.bincount(inverse))[:-1]
+            for cell, ids in zip(unique_cells.tolist(), numpy.split(self.plant_ids[order], splits)):
+                self.cell_to_plants[tuple(cell)] = ids
+
+    def plant_cell(self, plant_id):
+        """Cell of a plant
+
+        Parameters
+        ----------
+        plant_id : int
+            global plant id
+
+        Returns
+        -------
+        tuple
+            (ix, iy) cell of the plant
+        """        
+        return tuple(self.cells[self.plant_rows[plant_id]].tolist())
+
+    def plants_in_cell(self, cell):
+        """Plants located in a cell
+
+        Parameters
+        ----------
+        cell : tuple
+            (ix, iy) cell
+
+        Returns
+        -------
+        numpy.array
+            global ids of the plants in the cell
+        """        
+        return self.cell_to_plants.get(tuple(cell), numpy.zeros(0, dtype=int))
+
+    def specy_rows(self, global_index=None):
+        """Rows of the plants of one specy in the index arrays
+
+        Parameters
+        ----------
+        global_index : int, optional
+            specy ID in simulation, by default None for all plants
+
+        Returns
+        -------
+        numpy.array
+            rows of the plants in the index arrays
+        """        
+        if global_index is None:
+            return numpy.arange(len(self.plant_ids))
+        return numpy.flatnonzero(self.species == global_index)
+
+    def voxels(self, origin, voxel_size, global_index=None):
+        """Assigns plants to the voxels of another xy grid, like the soil grid
+
+        Parameters
+        ----------
+        origin : tuple
+            (x, y) origin of the grid in m
+        voxel_size : tuple
+            (dx, dy) voxel size in m
+        global_index : int, optional
+            specy ID in simulation, by default None for all plants
+
+        Returns
+        -------
+        numpy.array, numpy.array
+            voxel x id and voxel y id of each plant, in the order of the plant positions
+        """        
+        xy = self.positions[self.specy_rows(global_index), :2]
+        ix = numpy.floor((xy[:, 0] - origin[0]) / voxel_size[0]).astype(int)
+        iy = numpy.floor((xy[:, 1] - origin[1]) / voxel_size[1]).astype(int)
+        return ix, iy
+
+    def neighbours(self, point, radius):
+        """Plants located in a radius around a point on the xy plane
+
+        Parameters
+        ----------
+        point : tuple
+            (x, y) or (x, y, z) center in m
+        radius : float
+            radius in m
+
+        Returns
+        -------
+        numpy.array
+            sorted global ids of the plants at a distance lower or equal to radius
+        """        
+        point = numpy.asarray(point[:2], dtype=float)
+        cell_min = numpy.floor((point - radius - self.origin) / self.cell_size).astype(int)
+        cell_max = numpy.floor((point + radius - self.origin) / self.cell_size).astype(int)
+
+        candidates = [
+            self.cell_to_plants[(ix, iy)]
+            for ix in range(cell_min[0], cell_max[0] + 1)
+            for iy in range(cell_min[1], cell_max[1] + 1)
+            if (ix, iy) in self.cell_to_plants
+        ]
+        if not candidates:
+            return numpy.zeros(0, dtype=int)
+
+        candidates = numpy.concatenate(candidates)
+        rows = numpy.array([self.plant_rows[i] for i in candidates.tolist()], dtype=int)
+        distances = numpy.linalg.norm(self.positions[rows, :2] - point, axis=1)
+        return numpy.sort(candidates[distances <= radius])
+
+
+class LeafPerturbations:
+    """Azimut and inclination perturbations of duplicated leaves
+
+    Perturbations are stored in two dense arrays of shape (number of positions, number of leaves), a leaf vid
+    gets its column from a dictionary. Columns are drawn from a random generator seeded by the leaf vid, so a leaf keeps
+    the same perturbations whatever the order it is added in the table.
+
+    Parameters
+    ----------
+    number_of_positions : int
+        number of duplicated plants
+    var_leaf_azimut : float
+        variability for leaf azimut (rad)
+    var_leaf_inclination : float
+        variability for leaf inclination (rad)
+
+    """    
+    def __init__(self, number_of_positions, var_leaf_azimut, var_leaf_inclination) -> None:
+        """Constructor, creates an empty table
+
+        """        
+        self.number_of_positions = number_of_positions
+        self.var_leaf_azimut = var_leaf_azimut
+        self.var_leaf_inclination = var_leaf_inclination
+
+        self.vid_to_slot: dict = {}
+        self.__azimut = numpy.zeros((number_of_positions, 0))
+        self.__inclination = numpy.zeros((number_of_positions, 0))
+
+    @property
+    def azimut(self):
+        """Leaf azimut perturbations, array of shape (number of positions, number of leaves)"""
+        return self.__azimut[:, : len(self.vid_to_slot)]
+
+    @property
+    def inclination(self):
+        """Leaf inclination perturbations, array of shape (number of positions, number of leaves)"""
+        return self.__inclination[:, : len(self.vid_to_slot)]
+
+    def slots(self, vids):
+        """Return the columns of leaf vids in the table, new vids are drawn and added
+
+        Parameters
+        ----------
+        vids : list of int
+            leaf vids in the MTG
+
+        Returns
+        -------
+        numpy.array
+            column index of each vid
+        """        
+        new_vids = [vid for vid in dict.fromkeys(vids) if vid not in self.vid_to_slot]
+        if new_vids:
+            n_slots = len(self.vid_to_slot)
+            capacity = self.__azimut.shape[1]
+            if n_slots + len(new_vids) > capacity:
+                # capacity is doubled so that growing the table stays linear along the simulation
+                capacity = max(2 * capacity, n_slots + len(new_vids))
+                self.__azimut = self.__resized(self.__azimut, capacity)
+                self.__inclination = self.__resized(self.__inclination, capacity)
+
+            for vid in new_vids:
+                # same random draws as numpy.random.seed(vid) without changing the global random state
+                generator = numpy.random.RandomState(vid)
+                self.__azimut[:, n_slots] = generator.uniform(
+                    -self.var_leaf_azimut, self.var_leaf_azimut, size=self.number_of_positions
+                )
+                self.__inclination[:, n_slots] = generator.uniform(
+                    -self.var_leaf_inclination, self.var_leaf_inclination, size=self.number_of_positions
+                )
+                self.vid_to_slot[vid] = n_slots
+                n_slots += 1
+
+        return numpy.array([self.vid_to_slot[vid] for vid in vids], dtype=int)
+
+    def __resized(self, table, capacity):
+        """Copy a perturbation table in a bigger array
+
+        Parameters
+        ----------
+        table : numpy.array
+            perturbation table
+        capacity : int
+            new number of columns
+
+        Returns
+        -------
+        numpy.array
+            table padded with zeros
+        """        
+        resized = numpy.zeros((self.number_of_positions, capacity))
+        resized[:, : table.shape[1]] = table
+        return resized
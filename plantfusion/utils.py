@@ -1,5 +1,12 @@
+import atexit
 import os
+import queue
+import struct
+import threading
 import warnings
+import zipfile
+
+import numpy
 
 
 def save_df_to_csv(df, outputs_filepath, precision):
@@ -44,3 +51,120 @@ def create_child_folder(parentfolderpath, childfolderpath):
         print("Directory ", dirName, " Created ")
     except FileExistsError:
         print("Directory ", dirName, " already exists")
+
+
+class BackgroundWriter:
+    """Runs file writing tasks in a background thread
+
+    Tasks wait in a bounded queue: when it is full, ``submit`` blocks until the thread has written a file.
+    Remaining tasks are written before the end of the python process.
+
+    Parameters
+    ----------
+    queue_size : int, optional
+        maximum number of waiting tasks, by default 4
+
+    """    
+    def __init__(self, queue_size=4) -> None:
+        """Constructor, starts the writing thread
+
+        """        
+        self.tasks = queue.Queue(maxsize=queue_size)
+        self.error = None
+        self.thread = threading.Thread(target=self.__work, daemon=True)
+        self.thread.start()
+        atexit.register(self.flush)
+
+    def submit(self, function, *args, **kwargs):
+        """Adds a writing task, blocks while the queue is full
+
+        Parameters
+        ----------
+        function : callable
+            writing function, called in the background thread with args and kwargs
+        """        
+        self.__raise_error()
+        self.tasks.put((function, args, kwargs))
+
+    def flush(self):
+        """Waits until all submitted tasks are written
+        """        
+        self.tasks.join()
+        self.__raise_error()
+
+    def __work(self):
+        """Thread loop, runs the tasks in submission order
+        """        
+        while True:
+            function, args, kwargs = self.tasks.get()
+            try:
+                function(*args, **kwargs)
+            except Exception as error:
+                if self.error is None:
+                    self.error = error
+            finally:
+                self.tasks.task_done()
+
+    def __raise_error(self):
+        """Raises in the main thread the first error of the writing thread
+        """        
+        if self.error is not None:
+            error, self.error = self.error, None
+            raise error
+
+
+def load_npz(filepath, mmap_mode=None):
+    """Load all arrays of a .npz file
+
+    Note
+    ----
+    numpy.load does not memory-map the members of a .npz archive. As numpy.savez stores them without compression,
+    each member is a .npy file at a fixed offset of the archive and can be memory-mapped directly.
+
+    Parameters
+    ----------
+    filepath : str
+        path of the .npz file
+    mmap_mode : str, optional
+        memory-map mode, see numpy.memmap, by default None for arrays loaded in memory
+
+    Returns
+    -------
+    dict
+        each entry is {array name : numpy.array or numpy.memmap}
+    """    
+    if mmap_mode is None:
+        with numpy.load(filepath) as data:
+            return {name: data[name] for name in data.files}
+
+    arrays = {}
+    with zipfile.ZipFile(filepath) as archive, open(filepath, "rb") as file:
+        for info in archive.infolist():
+            if info.compress_type != zipfile.ZIP_STORED:
+                raise ValueError("compressed .npz members can not be memory-mapped")
+
+            # skips the zip local header of the member
+            file.seek(info.header_offset + 26)
+            name_length, extra_length = struct.unpack("<HH", file.read(4))
+            file.seek(info.header_offset + 30 + name_length + extra_length)
+
+            version = numpy.lib.format.read_magic(file)
+            if version == (1, 0):
+                shape, fortran_order, dtype = numpy.lib.format.read_array_header_1_0(file)
+            else:
+                shape, fortran_order, dtype = numpy.lib.format.read_array_header_2_0(file)
+
+            name = os.path.splitext(info.filename)[0]
+            if dtype.hasobject or numpy.prod(shape) == 0:
+                arrays[name] = numpy.load(archive.open(info.filename), allow_pickle=False)
+            else:
+                arrays[name] = numpy.memmap(
+                    filepath,
+                    dtype=dtype,
+                    mode=mmap_mode,
+                    offset=file.tell(),
+                    shape=shape,
+                    order="F" if fortran_order else "C",
+                )
+
+    return arrays
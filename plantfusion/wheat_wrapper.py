@@ -670,7 +670,11 @@ class Wheat_wrapper(object):
             
             * list of tuple precising stems id the plantgl scene. Elements are (specy id, organ id) 
         """        
-        if self.generation_type == "default":
+        generation_type = self.generation_type
+        if generation_type == "tile":
+            generation_type = planter.tile_arrangement
+
+        if generation_type == "default":
             scene_wheat = planter.create_heterogeneous_canopy(
                 self.adel_wheat,
                 mtg=self.g,
@@ -679,7 +683,7 @@ class Wheat_wrapper(object):
                 indice_wheat_instance=self.wheat_index,
             )
 
-        elif self.generation_type == "random":
+        elif generation_type == "random":
             scene_wheat = planter.generate_random_wheat(
                 self.adel_wheat,
                 mtg=self.g,
@@ -688,13 +692,13 @@ class Wheat_wrapper(object):
                 leaf_name="LeafElement1",
             )
 
-        elif self.generation_type == "row":
+        elif generation_type == "row":
             scene_wheat = planter.generate_row_wheat(
                 self.adel_wheat, self.g, self.wheat_index, stem_name="StemElement", leaf_name="LeafElement1"
             )
 
         else:
-            print("can't recognize positions generation type, choose between default, random and row")
+            print("can't recognize positions generation type, choose between default, random, row and tile")
             raise
 
         stems = extract_stems_from_MTG(self.g, self.global_index)
@@ -717,7 +721,7 @@ class Wheat_wrapper(object):
             saved_global_index = self.global_index
             self.global_index = selective_global_index
 
-        results = lighting.results_organs()
+        results = lighting.organs_view()
         lightmodel = lighting.lightmodel
 
         # crée un tableau comme dans caribu_facade de fspm-wheat
@@ -725,17 +729,21 @@ class Wheat_wrapper(object):
         para_dic = {}
         erel_dic = {}
 
-        df_outputs_esp = results[results.VegetationType == self.global_index]
-        for s in df_outputs_esp["Organ"]:
-            d = df_outputs_esp[df_outputs_esp.Organ == s]
+        # no organ results if the lighting has no organs
+        if results is not None:
+            specy_results = results.specy(self.global_index)
+            organs_rows = results.rows(self.global_index)
+            organs = list(organs_rows.keys())
+            rows = numpy.fromiter(organs_rows.values(), dtype=int, count=len(organs_rows))
 
             if lightmodel == "caribu":
-                para_dic[s] = d["par Eabs"].values[0] * energy
-                erel_dic[s] = d["par Eabs"].values[0]  # lighting ran with energy = 1.
+                eabs = specy_results["par Eabs"][rows]
+                para_dic = dict(zip(organs, (eabs * energy).tolist()))
+                erel_dic = dict(zip(organs, eabs.tolist()))  # lighting ran with energy = 1.
 
             elif lightmodel == "ratp":
-                para_dic[s] = d["PARa"].values[0] * energy
-                erel_dic[s] = d["Intercepted"].values[0]
+                para_dic = dict(zip(organs, (specy_results["PARa"][rows] * energy).tolist()))
+                erel_dic = dict(zip(organs, specy_results["Intercepted"][rows].tolist()))
 
         dico_par["PARa"] = para_dic
         dico_par["Erel"] = erel_dic
@@ -784,9 +792,10 @@ class Wheat_wrapper(object):
         roots_length_per_plant_per_soil_layer = self.compute_roots_length(soil, planter)
 
         # ls_epsi
-        organs_results = lighting.results_organs()
-        filtered_data = organs_results[organs_results.VegetationType.isin([self.global_index])]
-        plant_leaf_area = numpy.sum(filtered_data["Area"].values) / self.nb_plants
+        results = lighting.organs_view()
+        plant_leaf_area = 0.0
+        if results is not None:
+            plant_leaf_area = numpy.sum(results.specy(self.global_index)["Area"]) / self.nb_plants
         plants_light_interception = self.compute_plants_light_interception(plant_leaf_area, lighting.soil_energy())
 
         return (
@@ -833,17 +842,33 @@ class Wheat_wrapper(object):
         if selective_global_index is not None:
             self.global_index = saved_global_index
 
-    def run(self, t_light):
+    def run(self, t_light, lighting=None):
         """Time step computing of WheatFspm. Independant from other fspm in the simulation
 
+        Note
+        ----
+        Between two lighting steps, PARa is Erel times the meteo energy. If lighting has ``sun_course_hours``,
+        Erel is interpolated at the current hour from the sun course of the day, else the last Erel is used. Organs
+        missing from the sun course keep their last Erel.
+
         Parameters
         ----------
         t_light : int
             meteo timestep
+        lighting : Light_wrapper, optional
+            lighting wrapper of the last lighting step, by default None
         """     
 
         if not ((t_light % self.LIGHT_TIMESTEP == 0) and (self.PARi_next_hours(t_light) > 0)):
             Erel = self.g.property("Erel")
+            if lighting is not None and lighting.sun_course_hours is not None:
+                column = "par Eabs" if lighting.lightmodel == "caribu" else "Intercepted"
+                Erel = dict(Erel)
+                Erel.update(
+                    lighting.interpolated_organs(
+                        self.doy(t_light), self.hour(t_light), column, self.global_index, parunit="micromol.m-2.s-1"
+                    )
+                )
             PARa_output = {k: v * self.energy(t_light) for k, v in Erel.items()}
             outputs = {}
             outputs.update({"PARa": PARa_output})
@@ -1171,15 +1196,19 @@ class Wheat_wrapper(object):
             for axis in plant.axes:
                 roots_mass[i] += axis.roots.mstruct  # masse en g
 
-        positions = planter.wheat_positions[self.wheat_index]
         self.compute_SRL_wheat(roots_mass[0])
 
+        # voxels du sol de toutes les plantes en une fois
+        soil_voxel_size = (soil_wrapper.soil.dxyz[0][0], soil_wrapper.soil.dxyz[1][0])
+        voxels_ix, voxels_iy = planter.plants_spatial_index().voxels(
+            soil_wrapper.soil.origin, soil_voxel_size, self.global_index
+        )
+
         # longueur spécifique x masse en gramme/nbplantes
         ls_roots = []
-        for p in positions:
+        for ix, iy in zip(voxels_ix, voxels_iy):
             # on répartit de manière homogène les racines à travers les couches du sol
             # convertit m en cm # --> peut etre en metre finalement
-            ix, iy = soil_wrapper.whichvoxel_xy(p)
             roots_length_per_voxel = self.rootsdistribution(roots_mass[0], ix, iy, soil_wrapper)
             ls_roots.append(roots_length_per_voxel)
 
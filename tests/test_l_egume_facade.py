@@ -1,6 +1,9 @@
 from plantfusion.l_egume_wrapper import L_egume_wrapper
+from plantfusion.light_wrapper import Light_wrapper
+from plantfusion.indexer import Indexer
 import numpy
 import pandas
+import types
 
 
 def test_transfer_ratp_legume():
@@ -119,3 +122,35 @@ def test_transfer_caribu_legume():
     numpy.testing.assert_array_equal(list_invar[0]["parip"], [423.36, 311.04])
     assert list_invar[1]["parap"] == 138.24
     assert list_invar[1]["parip"] == 319.68
+
+
+def test_transfer_caribu_legume_sensors_layouts():
+    energy = 500.0
+    nb0 = 2
+    m_lais = numpy.zeros([1, 5, 2, 3])
+    dS = 1.5 * 1.5
+
+    # sensors ordered by x, then y, then z from the ground, up to the top of the canopy
+    nx, ny, nz = m_lais.shape[3], m_lais.shape[2], m_lais.shape[1] - nb0
+    sensors_outputs = pandas.DataFrame(
+        {"VegetationType": [0] * (nx * ny * nz), "PAR": numpy.linspace(0.1, 0.9, nx * ny * nz)}
+    )
+    elements_outputs = pandas.DataFrame({"VegetationType": [1], "Organ": [0], "Area": [1.0], "par Ei": [0.5]})
+
+    legume = L_egume_wrapper.__new__(L_egume_wrapper)
+    legume.name = "legume"
+    legume.indexer = Indexer(global_order=["legume", "wheat"], legume_names=["legume"], wheat_names=["wheat"])
+    legume.global_index = 0
+    legume.invar = {"Hplante": [0.0]}
+    legume.lsystem = types.SimpleNamespace(tag_loop_inputs={13: m_lais, 14: {"surf": []}, 15: dS})
+
+    res_trans_table = legume.transfer_caribu_legume(energy, nb0, elements_outputs, sensors_outputs)
+    res_trans_arrays = legume.transfer_caribu_legume(
+        energy, nb0, elements_outputs, {0: Light_wrapper.sensors_grid(sensors_outputs, 0, (nx, ny))}
+    )
+
+    numpy.testing.assert_array_equal(res_trans_table, res_trans_arrays)
+    assert res_trans_table[0][0][0] == dS * energy
+    # first sensor is the lowest layer of the first column
+    assert res_trans_table[4][0][0] == 0.1 * dS * energy
+    assert res_trans_table[2][1][2] == 0.9 * dS * energy
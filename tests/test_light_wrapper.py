@@ -0,0 +1,152 @@
+from plantfusion.light_wrapper import Light_wrapper, OrganResults
+from plantfusion.planter import Planter
+from plantfusion.indexer import Indexer
+import numpy
+import pandas
+
+
+class FakeLightModel:
+    """Light model with LightVegeManager outputs, each organ absorbs its height times the energy"""
+
+    def __init__(self, columns=("par Eabs", "par Ei")):
+        self.columns = columns
+        self.builds = 0
+        self.runs = 0
+        self.sensors = pandas.DataFrame({"VegetationType": [], "PAR": []})
+
+    def build(self, geometry):
+        self.builds += 1
+        self.organs = [
+            (specy_id, organ_id, numpy.asarray(triangles, dtype=float)[:, :, 2].mean())
+            for specy_id, scene in enumerate(geometry["scenes"])
+            for organ_id, triangles in scene.items()
+        ]
+
+    def run(self, energy=1.0, day=0, hour=0, **kwargs):
+        self.runs += 1
+        species, organs, heights = (numpy.array(x) for x in zip(*self.organs))
+        self.elements_outputs = pandas.DataFrame(
+            {"Day": day, "Hour": hour, "VegetationType": species, "Organ": organs, "Area": 0.5}
+        ).assign(**{c: energy * heights for c in self.columns})
+
+    def sensors_outputs(self, dataframe=True):
+        return self.sensors
+
+
+def lighting_wrapper(**kwargs):
+    indexer = Indexer(global_order=["wheat", "other"], wheat_names=["wheat"], other_names=["other"])
+    planter = Planter(
+        generation_type="row", indexer=indexer, plant_density={"wheat": 150, "other": 100}, inter_rows=0.1
+    )
+    lighting = Light_wrapper(planter=planter, indexer=indexer, lightmodel="caribu", **kwargs)
+    lighting.light = FakeLightModel()
+    return lighting
+
+
+def leaf(height, size=1.0):
+    return [[(0.0, 0.0, height), (size, 0.0, height), (0.0, size, height)]]
+
+
+def test_results_cache_eviction():
+    lighting = lighting_wrapper(cache_size=2)
+    scenes = [{1: leaf(0.2)}]
+
+    for energy in (1.0, 2.0, 3.0):
+        lighting.run(energy=energy, scenes=scenes)
+    assert lighting.light.runs == 3
+
+    # the oldest lighting was evicted, the last one is still cached
+    lighting.run(energy=1.0, scenes=scenes)
+    assert lighting.metrics["lighting"] == "computed"
+    lighting.run(energy=3.0, scenes=scenes)
+    assert lighting.metrics["lighting"] == "cached"
+    numpy.testing.assert_allclose(lighting.results_organs()["par Eabs"], [0.6])
+    assert lighting.light.runs == 4
+    assert lighting.light.builds == 1
+
+
+def test_canopy_changed_skips_lightings():
+    lighting = lighting_wrapper(change_tolerance=0.1, refresh_interval=2)
+
+    statuses = []
+    for size in (1.0, 1.02, 1.02, 1.02, 1.5):
+        lighting.run(scenes=[{1: leaf(0.2, size)}])
+        statuses.append(lighting.metrics["lighting"])
+
+    # small changes are skipped at most refresh_interval times in a row
+    assert statuses == ["computed", "skipped", "skipped", "computed", "computed"]
+
+    lighting.lit_descriptors = {0: (1.0, 0.2, 1)}
+    assert not lighting.canopy_changed({0: (1.05, 0.2, 1)})
+    assert lighting.canopy_changed({0: (1.2, 0.2, 1)})
+    assert lighting.canopy_changed({0: (1.0, 0.2, 2)})
+    assert lighting.canopy_changed({0: (1.0, 0.2, 1), 1: (1.0, 0.2, 1)})
+
+
+def test_organ_results():
+    organs_results = pandas.DataFrame(
+        {"VegetationType": [1, 0, 1, 0], "Organ": [4, 2, 4, 3], "par Eabs": [10.0, 20.0, 30.0, 40.0]}
+    )
+
+    results = OrganResults(organs_results)
+
+    assert results.species == [0, 1]
+    numpy.testing.assert_array_equal(results.specy(0)["Organ"], [2, 3])
+    numpy.testing.assert_array_equal(results.specy(1)["par Eabs"], [10.0, 30.0])
+    assert results.specy(2)["Organ"].size == 0
+    # the first result of an organ is used
+    assert results.rows(1) == {4: 0}
+    assert results.value(0, 3, "par Eabs") == 40.0
+
+
+def test_sensors_arrays():
+    lighting = lighting_wrapper()
+    lighting.sensors_layouts = {0: ([3, 2, 4], [0.1, 0.1, 0.1], [0.0, 0.0, 0.0])}
+    # sensors are ordered by x, then y, then z
+    lighting.light.sensors = pandas.DataFrame({"VegetationType": 0, "PAR": numpy.arange(24, dtype=float)})
+    lighting.run(scenes=[{1: leaf(0.2)}])
+
+    sensors = lighting.sensors_arrays()
+
+    assert sensors[0].shape == (4, 2, 3)
+    assert sensors[0][0, 0, 0] == 0.0
+    assert sensors[0][3, 0, 0] == 3.0
+    assert sensors[0][0, 1, 0] == 4.0
+    assert sensors[0][0, 0, 1] == 8.0
+    assert lighting.sensors_arrays() is sensors
+
+
+def test_hybrid_correction():
+    lighting = lighting_wrapper(hybrid_interval=2, hybrid_voxels_size=[0.1, 0.1, 0.1])
+    lighting.hybrid_light = FakeLightModel(columns=("PARa", "Intercepted"))
+    scenes = [{1: leaf(0.05), 2: leaf(0.25)}]
+    lighting.build(scenes)
+
+    caribu_results = pandas.DataFrame(
+        {
+            "VegetationType": [0, 0],
+            "Organ": [1, 2],
+            "Area": [0.5, 0.5],
+            "par Eabs": [2.0, 6.0],
+            "par Ei": [1.0, 1.0],
+        }
+    )
+    ratp_results = caribu_results[["VegetationType", "Organ"]].assign(PARa=[1.0, 2.0], Intercepted=[2.0, 0.0])
+
+    lighting.hybrid_factors = lighting.hybrid_correction(caribu_results, ratp_results)
+
+    numpy.testing.assert_allclose(lighting.hybrid_factors["layer"]["par Eabs"].to_numpy(), [2.0, 3.0])
+    numpy.testing.assert_allclose(lighting.hybrid_factors["specy"]["par Eabs"].to_numpy(), [8.0 / 3.0])
+    corrected = lighting.hybrid_organs(ratp_results.assign(PARa=[2.0, 4.0], Intercepted=[2.0, 3.0]))
+    numpy.testing.assert_allclose(corrected["par Eabs"], [4.0, 12.0])
+    # no RATP interception in the layer of organ 2 when factors were learned, the factor of the specy is used
+    numpy.testing.assert_allclose(corrected["par Ei"], [1.0, 3.0])
+
+    # CARIBU runs every hybrid_interval lightings, corrected RATP in between
+    statuses = []
+    for hour in range(4):
+        lighting.run(scenes=scenes, hour=hour)
+        statuses.append(lighting.metrics["lighting"])
+    assert statuses == ["computed", "hybrid", "computed", "hybrid"]
+    assert lighting.light.runs == 2
+    assert lighting.hybrid_light.runs == 4
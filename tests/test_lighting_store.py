@@ -0,0 +1,29 @@
+from plantfusion.lighting_store import LightingStore, read_store_steps, store_to_vtk
+import numpy
+import pandas
+
+
+def test_lighting_store(tmp_path):
+    store = LightingStore(str(tmp_path), chunk_size=2)
+    triangles = numpy.arange(27, dtype=float).reshape(3, 3, 3)
+    geometry = store.add_geometry("geometry", triangles, species=[0, 0, 1], organs=[5, 5, 7])
+    assert store.add_geometry("geometry", triangles, species=[0, 0, 1], organs=[5, 5, 7]) == geometry
+
+    for hour in range(3):
+        results = pandas.DataFrame(
+            {"VegetationType": [0, 1], "Organ": [5, 7], "par Eabs": [hour, 2.0 * hour], "Area": [1.0, 2.0]}
+        )
+        store.append(150, hour, geometry, results)
+    store.flush()
+
+    steps = read_store_steps(str(tmp_path))
+    assert [s["hour"] for s in steps] == [0, 1, 2]
+    numpy.testing.assert_array_equal(steps[2]["organs"], [5, 7])
+    numpy.testing.assert_allclose(steps[2]["values"]["par Eabs"], [2.0, 4.0])
+
+    paths = store_to_vtk(str(tmp_path))
+    assert len(paths) == 3
+    with open(paths[2]) as vtk_file:
+        lines = vtk_file.read().split("\n")
+    values = lines[lines.index("SCALARS par_Eabs float 1") + 2 :][:3]
+    assert values == ["2", "2", "4"]
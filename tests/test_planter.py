@@ -0,0 +1,148 @@
+from plantfusion.planter import Planter, SpatialIndex, decimate_triangles, euler_rotation_matrices
+from plantfusion.indexer import Indexer
+import numpy
+
+
+def test_euler_rotation_matrices():
+    azimut = numpy.array([0.0, numpy.pi / 2])
+    elevation = numpy.array([0.0, numpy.pi / 2])
+
+    rotations = euler_rotation_matrices(azimut, elevation)
+
+    numpy.testing.assert_allclose(rotations[0], numpy.identity(3), atol=1e-12)
+    # x axis is rotated around y then around z
+    numpy.testing.assert_allclose(rotations[1] @ [1.0, 0.0, 0.0], [0.0, 0.0, -1.0], atol=1e-12)
+    numpy.testing.assert_allclose(rotations[1] @ [0.0, 1.0, 0.0], [-1.0, 0.0, 0.0], atol=1e-12)
+
+
+def test_canopy_matrices():
+    positions = [(1.0, 2.0, 0.0), (3.0, 4.0, 0.0)]
+    azimuts = numpy.array([[0.0, numpy.pi / 2], [numpy.pi, 0.0]])
+    inclinations = numpy.zeros((2, 2))
+    anchors = numpy.array([[0.0, 0.0, 0.0], [1.0, 0.0, 0.5]])
+
+    matrices = Planter.canopy_matrices(positions, azimuts, inclinations, anchors)
+
+    assert matrices.shape == (2, 2, 4, 4)
+    # anchor point stays at its place before the translation to the plant position
+    numpy.testing.assert_allclose(matrices[0, 1] @ [1.0, 0.0, 0.5, 1.0], [2.0, 2.0, 0.5, 1.0], atol=1e-12)
+    # rotation around the anchor point
+    numpy.testing.assert_allclose(matrices[0, 1] @ [2.0, 0.0, 0.5, 1.0], [2.0, 3.0, 0.5, 1.0], atol=1e-12)
+    # stem rotation around the plant base
+    numpy.testing.assert_allclose(matrices[1, 0] @ [1.0, 0.0, 0.0, 1.0], [2.0, 4.0, 0.0, 1.0], atol=1e-12)
+
+
+def test_row_positions():
+    indexer = Indexer(global_order=["wheat", "other"], wheat_names=["wheat"], other_names=["other"])
+    planter = Planter(
+        generation_type="row",
+        indexer=indexer,
+        plant_density={"wheat": 150, "other": 100},
+        inter_rows=0.1,
+        noise_plant_positions=0.01,
+    )
+
+    numpy.random.seed(0)
+    positions = planter.row_positions(16, global_index=1, seed=4)
+    assert numpy.random.uniform() == numpy.random.RandomState(0).uniform()
+
+    assert positions.shape == (16, 3)
+    numpy.testing.assert_array_equal(positions, planter.row_positions(16, global_index=1, seed=4))
+    numpy.testing.assert_array_less(numpy.abs(positions[:8, 1] - 0.15), 0.01 + 1e-12)
+    numpy.testing.assert_array_less(numpy.abs(positions[8:, 1] - 0.35), 0.01 + 1e-12)
+    assert planter.generate_row_other(0)[0] == tuple(planter.other_positions[0][0])
+
+
+def test_spatial_index():
+    positions = numpy.array([(0.1, 0.1, 0.0), (0.15, 0.12, 0.0), (0.9, 0.9, 0.0), (0.45, 0.1, 0.0)])
+    index = SpatialIndex(positions, plant_ids=[0, 1, 2, 3], species=[0, 0, 0, 1], cell_size=0.25)
+
+    assert index.plant_cell(3) == (1, 0)
+    numpy.testing.assert_array_equal(index.plants_in_cell((0, 0)), [0, 1])
+    numpy.testing.assert_array_equal(index.neighbours((0.1, 0.1), 0.36), [0, 1, 3])
+
+    ix, iy = index.voxels((0.0, 0.0), (0.5, 0.5), global_index=0)
+    numpy.testing.assert_array_equal(ix, [0, 0, 1])
+    numpy.testing.assert_array_equal(iy, [0, 0, 1])
+
+
+def test_periodic_tile():
+    indexer = Indexer(global_order=["wheat", "other"], wheat_names=["wheat"], other_names=["other"])
+    planter = Planter(
+        generation_type="tile",
+        indexer=indexer,
+        plant_density={"wheat": 150, "other": 100},
+        inter_rows=0.1,
+        field_length=100.0,
+    )
+
+    assert planter.periodic
+    assert planter.domain == ((0.0, 0.0), (0.4, 0.4))
+    assert planter.number_of_plants == [24, 16]
+    numpy.testing.assert_allclose(planter.extrapolate_to_field(1.0), 100.0**2 / 0.4**2)
+
+
+def test_layout_roundtrip(tmp_path):
+    indexer = Indexer(global_order=["wheat", "other"], wheat_names=["wheat"], other_names=["other"])
+    planter = Planter(generation_type="row", indexer=indexer, plant_density={"wheat": 150, "other": 100}, inter_rows=0.1)
+    planter.generate_row_other(0)
+    filepath = str(tmp_path / "layout.npz")
+    planter.save_layout(filepath)
+
+    loaded = Planter(generation_type="row", indexer=indexer, plant_density={"wheat": 150, "other": 100}, inter_rows=0.2)
+    loaded.load_layout(filepath)
+
+    assert loaded.domain == planter.domain
+    assert loaded.number_of_plants == planter.number_of_plants
+    assert loaded.transformations["translate"] == planter.transformations["translate"]
+    assert isinstance(loaded.other_positions[0], numpy.memmap)
+    numpy.testing.assert_array_equal(loaded.other_positions[0], planter.other_positions[0])
+    assert loaded.generate_row_other(0) == planter.generate_row_other(0)
+
+
+def test_tile_layout_roundtrip(tmp_path):
+    indexer = Indexer(global_order=["wheat", "other"], wheat_names=["wheat"], other_names=["other"])
+    planter = Planter(
+        generation_type="tile",
+        indexer=indexer,
+        plant_density={"wheat": 150, "other": 100},
+        inter_rows=0.1,
+        field_length=100.0,
+    )
+    filepath = str(tmp_path / "layout.npz")
+    planter.save_layout(filepath)
+
+    loaded = Planter(generation_type="row", indexer=indexer, plant_density={"wheat": 150, "other": 100}, inter_rows=0.2)
+    loaded.load_layout(filepath)
+
+    assert loaded.generation_type == "tile"
+    assert loaded.periodic
+    assert loaded.tile_arrangement == planter.tile_arrangement
+    assert loaded.domain == planter.domain
+    assert loaded.field_domain == planter.field_domain
+    numpy.testing.assert_allclose(loaded.extrapolate_to_field(1.0), planter.extrapolate_to_field(1.0))
+
+
+def test_decimate_triangles():
+    # strip of 8 triangles along x
+    triangles = []
+    for i in range(4):
+        triangles.append([(i, 0.0, 0.0), (i + 1, 0.0, 0.0), (i, 1.0, 0.0)])
+        triangles.append([(i + 1, 0.0, 0.0), (i + 1, 1.0, 0.0), (i, 1.0, 0.0)])
+    triangles = numpy.array(triangles, dtype=float)
+
+    decimated = decimate_triangles(triangles, keep_ratio=0.25)
+
+    def areas(t):
+        return 0.5 * numpy.linalg.norm(numpy.cross(t[:, 1] - t[:, 0], t[:, 2] - t[:, 0]), axis=1)
+
+    assert decimated.shape == (2, 3, 3)
+    numpy.testing.assert_allclose(areas(decimated).sum(), areas(triangles).sum())
+    numpy.testing.assert_allclose(decimated[..., 2], 0.0)
+    # kept triangles are centered on their group
+    numpy.testing.assert_allclose(decimated.mean(axis=1), [[1.0, 0.5, 0.0], [3.0, 0.5, 0.0]])
+
+    # the target number of triangles is not exceeded
+    decimated = decimate_triangles(triangles[:5], keep_ratio=2 / 5)
+    assert len(decimated) == 2
+    numpy.testing.assert_allclose(areas(decimated).sum(), areas(triangles[:5]).sum())